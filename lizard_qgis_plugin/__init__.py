@@ -1,25 +1,50 @@
 # Lizard plugin for QGIS, licensed under GPLv2 or (at your option) any later version
 # Copyright (C) 2023 by Lutra Consulting for 3Di Water Management
 import os.path
+import sys
 
+from qgis.core import QgsApplication, QgsProject
 from qgis.PyQt.QtCore import QThreadPool
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
 
 from lizard_qgis_plugin.communication import UICommunication
 from lizard_qgis_plugin.deps.custom_imports import patch_wheel_imports
-from lizard_qgis_plugin.utils import count_scenarios_with_name
-from lizard_qgis_plugin.widgets.settings import SettingsDialog
 
-try:
-    from threedi_scenario_downloader import downloader
 
-    from lizard_qgis_plugin.widgets.lizard_archive_browser import LizardBrowser
-except ImportError:
+LAZY_EXPORTS = ("downloader", "LizardBrowser", "SettingsDialog")
+
+
+def _lazy_import(name):
+    """Import wheel-backed dependencies on first use instead of at QGIS startup."""
     patch_wheel_imports()
-    from threedi_scenario_downloader import downloader
+    if name == "downloader":
+        from threedi_scenario_downloader import downloader
+
+        return downloader
+    if name == "LizardBrowser":
+        from lizard_qgis_plugin.widgets.lizard_archive_browser import LizardBrowser
+
+        return LizardBrowser
+    if name == "SettingsDialog":
+        from lizard_qgis_plugin.widgets.settings import SettingsDialog
+
+        return SettingsDialog
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-    from lizard_qgis_plugin.widgets.lizard_archive_browser import LizardBrowser
+def __getattr__(name):
+    if name not in LAZY_EXPORTS:
+        # Don't patch the imports for attribute probes (e.g. dunder lookups done by importlib or inspect)
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _lazy_import(name)
+
+
+def _clear_utils_cache(clear_function_name):
+    """Call the utils cache clearing function, unless the utils weren't imported yet (so nothing is cached)."""
+    utils = sys.modules.get(f"{__name__}.utils")
+    if utils is not None:
+        getattr(utils, clear_function_name)()
 
 
 def classFactory(iface):
@@ -30,20 +55,39 @@ class ThreediLizardPlugin:
     PLUGIN_NAME = "Lizard"
     PLUGIN_ENTRY_NAME = "ThreediLizard"
     MAX_DOWNLOAD_THREAD_COUNT = 1
+    ACTIONS = (
+        (PLUGIN_NAME, "run", True),
+        ("Settings", "show_settings", False),
+    )
 
     def __init__(self, iface):
         self.iface = iface
         self.plugin_dir = os.path.dirname(__file__)
-        self.downloader = downloader
+        self._downloader = None
+        self._settings = None
         self.lizard_downloader_pool = QThreadPool()
         self.lizard_downloader_pool.setMaxThreadCount(self.MAX_DOWNLOAD_THREAD_COUNT)
         self.lizard_browser = None
         self.actions = []
+        self.icons = {}
         self.menu = self.PLUGIN_NAME
         self.toolbar = self.iface.addToolBar(self.PLUGIN_ENTRY_NAME)
         self.toolbar.setObjectName(self.PLUGIN_ENTRY_NAME)
         self.communication = UICommunication(self.iface, self.PLUGIN_NAME)
-        self.settings = SettingsDialog(self)
+
+    @property
+    def downloader(self):
+        if self._downloader is None:
+            self._downloader = _lazy_import("downloader")
+        return self._downloader
+
+    @property
+    def settings(self):
+        # Settings dialog patches the downloader, so it is created on the first plugin action as well
+        if self._settings is None:
+            SettingsDialog = _lazy_import("SettingsDialog")
+            self._settings = SettingsDialog(self)
+        return self._settings
 
     def add_action(
         self,
@@ -59,7 +103,9 @@ class ThreediLizardPlugin:
     ):
         """Add a toolbar icon to the toolbar."""
 
-        icon = QIcon(icon_path)
+        icon = self.icons.get(icon_path)
+        if icon is None:
+            icon = self.icons[icon_path] = QIcon(icon_path)
         action = QAction(icon, text, parent)
         action.triggered.connect(callback)
         action.setEnabled(enabled_flag)
@@ -83,23 +129,40 @@ class ThreediLizardPlugin:
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
         icon_path = os.path.join(self.plugin_dir, "icon.svg")
-        self.add_action(icon_path, text=self.PLUGIN_NAME, callback=self.run, parent=self.iface.mainWindow())
-        self.add_action(
-            icon_path,
-            text="Settings",
-            callback=self.show_settings,
-            parent=self.iface.mainWindow(),
-            add_to_toolbar=False,
-        )
+        parent = self.iface.mainWindow()
+        for text, callback_name, add_to_toolbar in self.ACTIONS:
+            self.add_action(
+                icon_path,
+                text=text,
+                callback=getattr(self, callback_name),
+                parent=parent,
+                add_to_toolbar=add_to_toolbar,
+            )
+        QgsProject.instance().transformContextChanged.connect(self.clear_transform_cache)
+        # Credentials could be also edited outside the plugin (e.g. in the QGIS Authentication settings)
+        QgsApplication.authManager().authDatabaseChanged.connect(self.clear_api_key_cache)
 
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
+        QgsProject.instance().transformContextChanged.disconnect(self.clear_transform_cache)
+        QgsApplication.authManager().authDatabaseChanged.disconnect(self.clear_api_key_cache)
+        self.clear_transform_cache()
+        self.clear_api_key_cache()
+        _clear_utils_cache("clear_raster_instances_cache")
         for action in self.actions:
             self.iface.removePluginMenu(self.PLUGIN_NAME, action)
             self.iface.removeToolBarIcon(action)
         # remove the toolbar
         del self.toolbar
 
+    def clear_transform_cache(self):
+        """Clear cached coordinate transformations."""
+        _clear_utils_cache("clear_transform_cache")
+
+    def clear_api_key_cache(self):
+        """Clear cached Lizard credentials."""
+        _clear_utils_cache("clear_api_key_cache")
+
     def show_settings(self):
         """Show plugin settings dialog."""
         self.settings.show()
@@ -112,6 +175,7 @@ class ThreediLizardPlugin:
         if not self.settings.api_key:
             return
         if self.lizard_browser is None:
+            LizardBrowser = _lazy_import("LizardBrowser")
             self.lizard_browser = LizardBrowser(self)
         self.lizard_browser.show()
         self.lizard_browser.raise_()
@@ -2,6 +2,7 @@
 # Copyright (C) 2023 by Lutra Consulting for 3Di Water Management
 import os
 import sys
+from importlib.util import find_spec
 
 MAIN_DIR = os.path.dirname(os.path.abspath(__file__))
 REQUIRED_SCENARIO_DOWNLOADER_VERSION = "1.4"
@@ -10,6 +11,11 @@ SCENARIO_DOWNLOADER_WHEEL = os.path.join(
     MAIN_DIR, f"threedi_scenario_downloader-{REQUIRED_SCENARIO_DOWNLOADER_VERSION}-py3-none-any.whl"
 )
 MI_UTILS_WHEEL = os.path.join(MAIN_DIR, f"threedi_mi_utils-{REQUIRED_3DI_MI_UTILS_VERSION}-py3-none-any.whl")
+WHEELS = (
+    ("threedi_scenario_downloader", SCENARIO_DOWNLOADER_WHEEL),
+    ("threedi_mi_utils", MI_UTILS_WHEEL),
+)
+_wheel_imports_patched = False
 
 
 def patch_wheel_imports():
@@ -17,14 +23,11 @@ def patch_wheel_imports():
     Function that tests if extra modules are installed.
     If modules are not available then it will add missing modules wheels to the Python path.
     """
-    try:
-        import threedi_scenario_downloader
-    except ImportError:
-        deps_path = SCENARIO_DOWNLOADER_WHEEL
-        sys.path.append(deps_path)
-
-    try:
-        import threedi_mi_utils
-    except ImportError:
-        deps_path = MI_UTILS_WHEEL
-        sys.path.append(deps_path)
+    global _wheel_imports_patched
+    if _wheel_imports_patched:
+        return
+    for module_name, wheel_path in WHEELS:
+        # The wheel may already be on the path if the plugin was reloaded
+        if wheel_path not in sys.path and find_spec(module_name) is None:
+            sys.path.append(wheel_path)
+    _wheel_imports_patched = True
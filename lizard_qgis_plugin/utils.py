@@ -1,31 +1,85 @@
 # Lizard plugin for QGIS, licensed under GPLv2 or (at your option) any later version
 # Copyright (C) 2023 by Lutra Consulting for 3Di Water Management
+import hashlib
 import os
-import uuid
-from math import ceil, sqrt
-from xml.etree import ElementTree
-
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from functools import lru_cache
+from math import ceil, isqrt
+from types import SimpleNamespace
+from urllib.parse import quote, urlencode
+
+import numpy as np
 import requests
-from osgeo import gdal
 from qgis.core import (
     QgsApplication,
     QgsAuthMethodConfig,
+    QgsCoordinateReferenceSystem,
     QgsCoordinateTransform,
     QgsFeature,
-    QgsField,
+    QgsFeatureSink,
     QgsGeometry,
     QgsLayerTreeGroup,
     QgsLayerTreeLayer,
+    QgsMapLayerUtils,
     QgsPointXY,
     QgsProject,
     QgsVectorFileWriter,
     QgsVectorLayer,
 )
-from qgis.PyQt.QtCore import QSettings, QVariant
+from qgis.PyQt.QtCore import QSettings
+from qgis.utils import plugins
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from lxml import etree as ElementTree
+
+    LXML_AVAILABLE = True
+    XML_PARSER_OPTIONS = {"huge_tree": True, "remove_blank_text": True, "collect_ids": False, "resolve_entities": False}
+except ImportError:
+    from xml.etree import ElementTree
+
+    LXML_AVAILABLE = False
+    XML_PARSER_OPTIONS = {}
 
 LIZARD_SETTINGS_ENTRY = "lizard_qgis_plugin"
 LIZARD_AUTHCFG_ENTRY = f"{LIZARD_SETTINGS_ENTRY}/authcfg"
 RASTER_FALLBACK_RESOLUTION = 1.0
+RASTER_TASKS_MAX_WORKERS = 8
+RASTER_METADATA_MAX_WORKERS = 8
+CLIP_WARP_MEMORY_LIMIT = 512  # MB
+WRITE_PROBE_FILENAME = ".lizard_write_probe"
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+WMS_NAMESPACE = "{http://www.opengis.net/wms}"
+WMS_TAG_NAMES = ("Layer", "Name", "Title", "CRS", "Dimension", "Style")
+WMS_TAGS = tuple(f"{WMS_NAMESPACE}{tag}" for tag in WMS_TAG_NAMES)
+CAPABILITIES_CACHE_SIZE = 64
+RASTER_INSTANCES_CACHE_SIZE = 256
+LIZARD_REQUEST_TIMEOUT = (10, 120)  # Connect and read timeouts in seconds
+LIZARD_MAX_CONNECTIONS = 16  # Pooled connections per host, also limits the downloads running at once
+PIXEL_GRID_PRECISION = 9  # Number of decimal places used when snapping extents to the pixel grid
+WMS_URI_PARAMETERS_ORDER = (
+    "allowTemporalUpdates",
+    "authcfg",
+    "crs",
+    "layers",
+    "styles",
+    "timeDimensionExtent",
+    "type",
+    "url",
+)
+_AUTHCFG_ID_CACHE = {}
+_API_KEY_CACHE = {}
+_SESSION = None
+_TASKS_SESSION = None
+_TRANSFORM_CACHE = {}
+_CAPABILITIES_CACHE = {}
+_RASTER_INSTANCES_CACHE = {}
+_TASKS_BULK_LOOKUP_UNSUPPORTED = set()  # Lizard URLs that ignore the tasks "uuid__in" filter
+_DOWNLOAD_SLOTS = threading.BoundedSemaphore(LIZARD_MAX_CONNECTIONS)
 
 
 class WMSServiceException(Exception):
@@ -34,24 +88,45 @@ class WMSServiceException(Exception):
 
 def get_api_key_authcfg_id():
     """Getting Lizard credentials ID from the QGIS Authorization Manager."""
-    settings = QSettings()
-    authcfg_id = settings.value(LIZARD_AUTHCFG_ENTRY, None)
+    try:
+        authcfg_id = _AUTHCFG_ID_CACHE[LIZARD_AUTHCFG_ENTRY]
+    except KeyError:
+        settings = QSettings()
+        authcfg_id = settings.value(LIZARD_AUTHCFG_ENTRY, None)
+        _AUTHCFG_ID_CACHE[LIZARD_AUTHCFG_ENTRY] = authcfg_id
     return authcfg_id
 
 
 def get_api_key_auth_manager():
     """Getting Lizard credentials from the QGIS Authorization Manager."""
     authcfg_id = get_api_key_authcfg_id()
+    api_key = _API_KEY_CACHE.get(authcfg_id)
+    if api_key is not None:
+        return api_key
     auth_manager = QgsApplication.authManager()
     authcfg = QgsAuthMethodConfig()
     auth_manager.loadAuthenticationConfig(authcfg_id, authcfg, True)
     api_key = authcfg.config("password")
+    if api_key:
+        _API_KEY_CACHE[authcfg_id] = api_key
     return api_key
 
 
+def api_key_fingerprint(api_key):
+    """Return a digest of the API key, for keeping the credentials apart in caches without storing the key itself."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def clear_api_key_cache():
+    """Clear cached Lizard credentials."""
+    _AUTHCFG_ID_CACHE.clear()
+    _API_KEY_CACHE.clear()
+
+
 def set_api_key_auth_manager(api_key):
     """Setting Lizard credentials in the QGIS Authorization Manager."""
     username = "__key__"
+    clear_api_key_cache()
     settings = QSettings()
     authcfg_id = settings.value(LIZARD_AUTHCFG_ENTRY, None)
     authcfg = QgsAuthMethodConfig()
@@ -69,99 +144,266 @@ def set_api_key_auth_manager(api_key):
         authcfg.setConfig("password", api_key)
         auth_manager.storeAuthenticationConfig(authcfg)
         settings.setValue(LIZARD_AUTHCFG_ENTRY, authcfg.id())
+    # Prime the cache with the freshly stored credentials
+    _AUTHCFG_ID_CACHE[LIZARD_AUTHCFG_ENTRY] = authcfg.id()
+    if api_key:
+        _API_KEY_CACHE[authcfg.id()] = api_key
+
+
+class LizardHTTPAdapter(HTTPAdapter):
+    """HTTP adapter applying the default timeout to requests sent without an explicit one."""
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = LIZARD_REQUEST_TIMEOUT
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+def create_lizard_session(retries):
+    """Create HTTP session with the Lizard adapter using given retries policy."""
+    session = requests.Session()
+    adapter = LizardHTTPAdapter(pool_connections=8, pool_maxsize=LIZARD_MAX_CONNECTIONS, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
+def get_lizard_session():
+    """Return HTTP session shared by all Lizard REST calls (keeps connections alive between requests)."""
+    global _SESSION
+    if _SESSION is None:
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 502, 503, 504))
+        _SESSION = create_lizard_session(retries)
+    return _SESSION
 
-def get_capabilities_layer_uris(wms_url):
+
+def get_lizard_tasks_session():
+    """
+    Return HTTP session for the requests creating Lizard tasks.
+    Gateway errors and read timeouts may come after the task was already queued, so only the requests
+    that surely didn't create the task (connection errors and throttled requests) are retried.
+    """
+    global _TASKS_SESSION
+    if _TASKS_SESSION is None:
+        retries = Retry(total=3, connect=3, read=0, other=0, backoff_factor=0.3, status_forcelist=(429,))
+        _TASKS_SESSION = create_lizard_session(retries)
+    return _TASKS_SESSION
+
+
+def run_limited_download(download_method, *args, **kwargs):
+    """
+    Run the `download_method` holding one of the download slots shared by all the workers.
+    Keeps the number of simultaneous downloads within the session connection pool size,
+    no matter how many downloaders are running at the same time.
+    """
+    with _DOWNLOAD_SLOTS:
+        return download_method(*args, **kwargs)
+
+
+def download_file_atomically(download_method, source, target_filepath):
+    """
+    Download `source` with the `download_method(source, filepath)` into a partial file
+    and move it to the `target_filepath` only after the download has finished.
+    An interrupted download therefore never leaves a truncated file under the target name.
+    """
+    partial_filepath = f"{target_filepath}{PARTIAL_DOWNLOAD_SUFFIX}"
+    try:
+        download_method(source, partial_filepath)
+    except Exception:
+        if os.path.exists(partial_filepath):
+            os.remove(partial_filepath)
+        raise
+    os.replace(partial_filepath, target_filepath)
+
+
+def get_content_length(url, api_key):
+    """Return the file size reported by the server for the `url` (None if the size is not reported)."""
+    # Amazon S3 links are presigned, so don't send them Lizard's auth headers
+    auth = ("__key__", api_key) if "amazon" not in url else None
+    r = get_lizard_session().head(url=url, auth=auth, allow_redirects=True)
+    r.raise_for_status()
+    content_length = r.headers.get("Content-Length")
+    return int(content_length) if content_length is not None else None
+
+
+def get_lizard_session_requests():
+    """
+    Return a stand-in for the `requests` module that sends module level `requests.get` calls through
+    the shared Lizard session, so modules calling `requests.get` directly reuse the pooled connections.
+    """
+    return SimpleNamespace(
+        get=lambda url, **kwargs: get_lizard_session().get(url, **kwargs),
+        exceptions=requests.exceptions,
+    )
+
+
+@lru_cache(maxsize=4)
+def wms_capabilities_tags(namespace):
+    """Return namespace qualified WMS capabilities tags (Layer, Name, Title, CRS, Dimension, Style)."""
+    return tuple(f"{namespace}{tag}" for tag in WMS_TAG_NAMES)
+
+
+def wms_layer_uri(layer_element, wms_tags, common_wms_parameters):
+    """
+    Get WMS layer title and URI out of the capabilities layer element.
+    The common parameters (shared by all layers) are expected to be already URL encoded.
+    """
+    property_tags = wms_tags[1:]  # Name, Title, CRS, Dimension, Style
+    # Single pass over the direct children, keeping the first element of each property tag
+    layer_properties = dict.fromkeys(property_tags)
+    for child_element in layer_element:
+        child_tag = child_element.tag
+        if child_tag in layer_properties and layer_properties[child_tag] is None:
+            layer_properties[child_tag] = child_element
+    (
+        layer_name_element,
+        layer_title_element,
+        layer_crs_element,
+        layer_dimension_element,
+        layer_style_element,
+    ) = layer_properties.values()
+    layer_title = layer_title_element.text
+    layer_name = layer_name_element.text
+    layer_crs = layer_crs_element.text
+    # QGIS decodes the URI with QUrlQuery, which does not treat "+" as a space - hence "quote" instead of "quote_plus"
+    layer_wms_parameters = {
+        **common_wms_parameters,
+        "layers": quote(layer_name, safe=""),
+        "crs": quote(layer_crs, safe=""),
+    }
+    if layer_dimension_element is not None and layer_dimension_element.attrib["name"] == "time":
+        time_dimension_extent = layer_dimension_element.text.strip()
+        layer_wms_parameters["allowTemporalUpdates"] = "true"
+        layer_wms_parameters["type"] = "wmst"
+        layer_wms_parameters["timeDimensionExtent"] = quote(time_dimension_extent, safe="")
+    if layer_style_element is not None:
+        layer_wms_parameters["styles"] = ""
+    layer_uri = "&".join(
+        f"{key}={layer_wms_parameters[key]}" for key in WMS_URI_PARAMETERS_ORDER if key in layer_wms_parameters
+    )
+    return layer_title, layer_uri
+
+
+def conditional_request_headers(response):
+    """Return headers for revalidating the response content with a conditional request."""
+    response_headers = response.headers
+    headers = {}
+    if "ETag" in response_headers:
+        headers["If-None-Match"] = response_headers["ETag"]
+    if "Last-Modified" in response_headers:
+        headers["If-Modified-Since"] = response_headers["Last-Modified"]
+    return headers
+
+
+def get_capabilities_layer_uris(wms_url, api_key=None):
     """Get WMS layer URIs."""
-    get_capabilities_response = requests.get(url=wms_url, auth=("__key__", get_api_key_auth_manager()))
-    get_capabilities_xml = get_capabilities_response.text
-    root = ElementTree.fromstring(get_capabilities_xml)
-    namespace = root.tag.replace("WMS_Capabilities", "")
-    layer_tag = f"{namespace}Layer"
-    name_tag = f"{namespace}Name"
-    title_tag = f"{namespace}Title"
-    crs_tag = f"{namespace}CRS"
-    dimension_tag = f"{namespace}Dimension"
-    style_tag = f"{namespace}Style"
-    layer_section_elements = list(root.iter(layer_tag))
-    if not layer_section_elements:
-        exception_namespace = root.tag.replace("ServiceExceptionReport", "")
-        exception_details_tag = f"{exception_namespace}ServiceException"
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
+    wms_uris = []
+    authcfg_id = get_api_key_authcfg_id()
+    common_wms_parameters = {"url": quote(wms_url, safe="")}
+    if authcfg_id:
+        common_wms_parameters["authcfg"] = quote(authcfg_id, safe="")
+    cache_key = (wms_url, authcfg_id)
+    cached_validators, cached_wms_uris = _CAPABILITIES_CACHE.pop(cache_key, ({}, None))
+    root, wms_tags, layer_depth, layer_sections_count = None, None, 0, 0
+    with get_lizard_session().get(
+        url=wms_url, auth=("__key__", api_key), headers=cached_validators, stream=True
+    ) as get_capabilities_response:
+        if get_capabilities_response.status_code == 304 and cached_wms_uris is not None:
+            # Capabilities haven't changed since the last request, reuse already parsed layers
+            _CAPABILITIES_CACHE[cache_key] = (cached_validators, cached_wms_uris)
+            return list(cached_wms_uris)
+        validators = conditional_request_headers(get_capabilities_response)
+        get_capabilities_response.raw.decode_content = True
+        # Parse the capabilities while they are streamed, processing each layer as soon as it is complete
+        for event, element in ElementTree.iterparse(
+            get_capabilities_response.raw, events=("start", "end"), **XML_PARSER_OPTIONS
+        ):
+            if root is None:
+                root = element
+                namespace = root.tag[: root.tag.find("}") + 1]
+                wms_tags = WMS_TAGS if namespace == WMS_NAMESPACE else wms_capabilities_tags(namespace)
+                continue
+            if element.tag != wms_tags[0]:
+                continue
+            if event == "start":
+                layer_depth += 1
+                layer_sections_count += 1
+                continue
+            layer_depth -= 1
+            if layer_depth == 0:
+                continue  # Top level layers group
+            wms_uris.append(wms_layer_uri(element, wms_tags, common_wms_parameters))
+            element.clear()
+            if LXML_AVAILABLE and layer_depth == 1:
+                # Drop already processed sibling layers as well, so parsed tree doesn't grow with the document
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+    if not layer_sections_count:
+        exception_details_tag = f"{namespace}ServiceException"
         exception_details = next(root.iter(exception_details_tag), "Exception details not found")
         exception_details_text = exception_details.text.replace("detail:", "").strip()
         raise WMSServiceException(exception_details_text)
-    layer_group, layer_elements = layer_section_elements[0], layer_section_elements[1:]
-    wms_uris = []
-    authcfg_id = get_api_key_authcfg_id()
-    authcfg_parameter = f"authcfg={authcfg_id}" if authcfg_id else None
-    url_parameter = f"url={wms_url}"
-    for layer_element in layer_elements:
-        layer_wms_parameters = [url_parameter]
-        layer_name_element = next(layer_element.iter(name_tag), None)
-        layer_title_element = next(layer_element.iter(title_tag), None)
-        layer_crs_element = next(layer_element.iter(crs_tag))
-        layer_dimension_element = next(layer_element.iter(dimension_tag), None)
-        layer_style_element = next(layer_element.iter(style_tag), None)
-        layer_title = layer_title_element.text
-        layer_name = layer_name_element.text
-        layer_wms_parameters.append(f"layers={layer_name}")
-        layer_crs = layer_crs_element.text
-        layer_wms_parameters.append(f"crs={layer_crs}")
-        if layer_dimension_element is not None and layer_dimension_element.attrib["name"] == "time":
-            time_dimension_extent = layer_dimension_element.text.strip()
-            layer_wms_parameters += [
-                "allowTemporalUpdates=true",
-                "type=wmst",
-                f"timeDimensionExtent={time_dimension_extent}",
-            ]
-        if layer_style_element is not None:
-            layer_wms_parameters.append("styles")
-        if authcfg_parameter:
-            layer_wms_parameters.append(authcfg_parameter)
-        layer_wms_parameters.sort()
-        layer_uri = "&".join(layer_wms_parameters)
-        wms_uris.append((layer_title, layer_uri))
+    if validators:
+        if len(_CAPABILITIES_CACHE) >= CAPABILITIES_CACHE_SIZE:
+            del _CAPABILITIES_CACHE[next(iter(_CAPABILITIES_CACHE))]  # Drop the least recently used entry
+        _CAPABILITIES_CACHE[cache_key] = (validators, tuple(wms_uris))
     return wms_uris
 
 
-def get_available_rasters_list(lizard_url):
+def get_available_rasters_list(lizard_url, api_key=None):
     """List all available rasters."""
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
     url = f"{lizard_url}rasters/"
-    r = requests.get(url=url, auth=("__key__", get_api_key_auth_manager()))
+    r = get_lizard_session().get(url=url, auth=("__key__", api_key))
     r.raise_for_status()
     response_json = r.json()
     available_rasters = response_json["results"]
     return available_rasters
 
 
-def find_rasters(lizard_url, limit, **kwargs):
-    """Find all available rasters matching given criteria."""
-    url = f"{lizard_url}rasters/"
+def find_with_count(lizard_url, endpoint, limit, api_key=None, **kwargs):
+    """Find given endpoint items matching given criteria, together with the total count of matching items."""
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
+    url = f"{lizard_url}{endpoint}/"
     payload = {"limit": limit}
     payload.update(kwargs)
-    r = requests.get(url=url, auth=("__key__", get_api_key_auth_manager()), params=payload)
+    r = get_lizard_session().get(url=url, auth=("__key__", api_key), params=payload)
     r.raise_for_status()
     response_json = r.json()
-    matching_rasters = response_json["results"]
+    results_count, matching_items = response_json["count"], response_json["results"]
+    return results_count, matching_items
+
+
+def find_rasters(lizard_url, limit, api_key=None, **kwargs):
+    """Find all available rasters matching given criteria."""
+    matching_rasters = find_with_count(lizard_url, "rasters", limit, api_key, **kwargs)[1]
     return matching_rasters
 
 
-def count_rasters_with_name(lizard_url, name):
+def count_rasters_with_name(lizard_url, name, api_key=None):
     """Return rasters search results count."""
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
     url = f"{lizard_url}rasters/"
     payload = {"name__icontains": name, "limit": 1}
-    r = requests.get(url=url, auth=("__key__", get_api_key_auth_manager()), params=payload)
+    r = get_lizard_session().get(url=url, auth=("__key__", api_key), params=payload)
     r.raise_for_status()
     response_json = r.json()
     results_count = response_json["count"]
     return results_count
 
 
-def count_scenarios_with_name(lizard_url, name):
+def count_scenarios_with_name(lizard_url, name, api_key=None):
     """Return scenario search results count."""
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
     url = f"{lizard_url}scenarios/"
     payload = {"name__icontains": name, "limit": 1}
-    r = requests.get(url=url, auth=("__key__", get_api_key_auth_manager()), params=payload)
+    r = get_lizard_session().get(url=url, auth=("__key__", api_key), params=payload)
     r.raise_for_status()
     response_json = r.json()
     results_count = response_json["count"]
@@ -176,23 +418,144 @@ def create_tree_group(name, insert_at_top=True):
     return grp
 
 
+def add_layers_to_group(group, layers, insert_at_top=False):
+    """Adding layers to the specific group."""
+    project = QgsProject.instance()
+    project.addMapLayers(layers, False)
+    insert_index = 0 if insert_at_top else -1
+    for layer in layers:
+        layer_node = QgsLayerTreeLayer(layer)
+        group.insertChildNode(insert_index, layer_node)
+        layer_node.setExpanded(False)
+
+
 def add_layer_to_group(group, layer, insert_at_top=False):
     """Adding layer to the specific group."""
-    project = QgsProject.instance()
-    root = project.layerTreeRoot()
-    project.addMapLayer(layer, False)
-    group.insertChildNode(0 if insert_at_top else -1, QgsLayerTreeLayer(layer))
-    layer_node = root.findLayer(layer.id())
-    layer_node.setExpanded(False)
+    add_layers_to_group(group, [layer], insert_at_top)
+
+
+def layers_extent(layers, crs, transform_context):
+    """Return extent covering all given layers (in the given CRS)."""
+    return QgsMapLayerUtils.combinedExtent(layers, crs, transform_context)
 
 
 def try_to_write(working_dir):
-    """Try to write and remove an empty text file into given location."""
-    test_filename = f"{uuid.uuid4()}.txt"
-    test_file_path = os.path.join(working_dir, test_filename)
-    with open(test_file_path, "w") as test_file:
-        test_file.write("")
-    os.remove(test_file_path)
+    """Try to write and remove an empty temporary file into given location."""
+    if not os.access(working_dir, os.W_OK):
+        raise PermissionError(f"No write permission to the '{working_dir}'")
+    # Network shares may report write access incorrectly, so do a real write probe as well
+    probe_filepath = os.path.join(working_dir, WRITE_PROBE_FILENAME)
+    try:
+        probe_fd = os.open(probe_filepath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Never touch a file that this probe did not create, use a unique name instead
+        probe_fd, probe_filepath = tempfile.mkstemp(prefix=WRITE_PROBE_FILENAME, dir=working_dir)
+    os.close(probe_fd)
+    os.remove(probe_filepath)
+
+
+def get_threedi_auth():
+    """
+    Return the 3Di personal API token and API URL taken from the 3Di Models and Simulations plugin settings.
+    Return None if the plugin is not available. Has to be called from the main thread (reads the QGIS auth manager).
+    """
+    try:
+        import threedi_models_and_simulations.deps.custom_imports as ci
+
+        ci.patch_wheel_imports()
+        threedi_models_and_simulations = plugins["threedi_models_and_simulations"]
+    except (AttributeError, ImportError, KeyError):
+        return None
+    ms_settings = threedi_models_and_simulations.plugin_settings
+    username, personal_api_token = ms_settings.get_3di_auth()
+    return personal_api_token, ms_settings.api_url
+
+
+def get_schematisation_revision_results_dir(working_dir, model_id, threedi_auth):
+    """
+    Get (and create if missing) the results directory of the schematisation revision of the 3Di model.
+    The `threedi_auth` is the (personal_api_token, api_url) pair resolved with the `get_threedi_auth`.
+    Return None if the model has no schematisation.
+    """
+    import threedi_models_and_simulations.api_calls.threedi_calls as tc
+    from threedi_mi_utils import LocalRevision, LocalSchematisation, list_local_schematisations
+
+    personal_api_token, api_url = threedi_auth
+    threedi_api = tc.get_api_client_with_personal_api_token(personal_api_token, api_url)
+    threedi_api_calls = tc.ThreediCalls(threedi_api)
+    local_schematisations = list_local_schematisations(working_dir)
+    model_3di = threedi_api_calls.fetch_3di_model(int(model_id))
+    model_schematisation_id = model_3di.schematisation_id
+    if not model_schematisation_id:
+        return None
+    model_schematisation_name = model_3di.schematisation_name
+    model_revision_number = model_3di.revision_number
+    try:
+        local_schematisation = local_schematisations[model_schematisation_id]
+    except KeyError:
+        local_schematisation = LocalSchematisation(
+            working_dir, model_schematisation_id, model_schematisation_name, create=True
+        )
+    try:
+        local_revision = local_schematisation.revisions[model_revision_number]
+    except KeyError:
+        local_revision = LocalRevision(local_schematisation, model_revision_number)
+        local_revision.make_revision_structure()
+    return local_revision.results_dir
+
+
+def axis_pixel_count(length, pixel_size):
+    """
+    Return number of pixels needed to cover the given length and whether the length is aligned to the pixel grid.
+    Values are compared as scaled integers to stay immune to the floating point noise in the extent coordinates.
+    """
+    scale = 10**PIXEL_GRID_PRECISION
+    scaled_pixel_size = round(abs(pixel_size) * scale)
+    if not scaled_pixel_size:
+        pixel_count = abs(length / pixel_size)
+        return ceil(pixel_count), pixel_count.is_integer()
+    pixel_count, remainder = divmod(round(abs(length) * scale), scaled_pixel_size)
+    if remainder:
+        return pixel_count + 1, False
+    return pixel_count, True
+
+
+def split_bbox(x1, y1, x2, y2, pixelsize_x, pixelsize_y, max_pixel_count):
+    """
+    Split bounding box into tiles that fit in to maximum pixel count limit.
+    Tiles of elongated extents span the whole narrow side, so fewer tiles are needed to cover the extent.
+    """
+    width, width_aligned = axis_pixel_count(x2 - x1, pixelsize_x)
+    height, height_aligned = axis_pixel_count(y2 - y1, pixelsize_y)
+    if not width_aligned:
+        x2 = (width * pixelsize_x) + x1
+    if not height_aligned:
+        y2 = (height * pixelsize_y) + y1
+    raster_pixel_count = width * height
+    if raster_pixel_count <= max_pixel_count:
+        return [(x1, y1, x2, y2)], width, height
+    max_pixel_per_axis = isqrt(max_pixel_count)
+    if width <= height:
+        tile_width = min(width, max_pixel_per_axis)
+        tile_height = max_pixel_count // tile_width
+    else:
+        tile_height = min(height, max_pixel_per_axis)
+        tile_width = max_pixel_count // tile_height
+    # Integer ceiling division - width and height are whole pixel counts at this point
+    columns_count = -(-width // tile_width)
+    rows_count = -(-height // tile_height)
+    # Spread the pixels evenly over the tiles, so the last column and row don't reach far beyond the extent
+    tile_width = -(-width // columns_count)
+    tile_height = -(-height // rows_count)
+    sub_width = tile_width * pixelsize_x
+    sub_height = tile_height * pixelsize_y
+    sub_x1, sub_y1 = np.meshgrid(
+        x1 + np.arange(columns_count) * sub_width, y1 + np.arange(rows_count) * sub_height, indexing="ij"
+    )
+    sub_bboxes = np.stack([sub_x1, sub_y1, sub_x1 + sub_width, sub_y1 + sub_height], axis=-1).reshape(-1, 4)
+    bboxes = sub_bboxes.tolist()
+    spatial_bounds = (bboxes, tile_width, tile_height)
+    return spatial_bounds
 
 
 def split_scenario_extent(scenario_instance, resolution=None, max_pixel_count=1 * 10**8):
@@ -210,35 +573,7 @@ def split_scenario_extent(scenario_instance, resolution=None, max_pixel_count=1
     else:
         pixelsize_x = resolution
         pixelsize_y = resolution
-    width = abs((x2 - x1) / pixelsize_x)
-    height = abs((y2 - y1) / pixelsize_y)
-    if not width.is_integer():
-        width = ceil(width)
-        x2 = (width * pixelsize_x) + x1
-    if not height.is_integer():
-        height = ceil(height)
-        y2 = (height * pixelsize_y) + y1
-    raster_pixel_count = width * height
-    if raster_pixel_count > max_pixel_count:
-        max_pixel_per_axis = int(sqrt(max_pixel_count))
-        columns_count = ceil(width / max_pixel_per_axis)
-        rows_count = ceil(height / max_pixel_per_axis)
-        sub_width = max_pixel_per_axis * pixelsize_x
-        sub_height = max_pixel_per_axis * pixelsize_y
-        bboxes = []
-        for column_idx in range(columns_count):
-            sub_x1 = x1 + (column_idx * sub_width)
-            sub_x2 = sub_x1 + sub_width
-            for row_idx in range(rows_count):
-                sub_y1 = y1 + (row_idx * sub_height)
-                sub_y2 = sub_y1 + sub_height
-                sub_bbox = (sub_x1, sub_y1, sub_x2, sub_y2)
-                bboxes.append(sub_bbox)
-        spatial_bounds = (bboxes, sub_width, sub_height)
-    else:
-        bboxes = [(x1, y1, x2, y2)]
-        spatial_bounds = (bboxes, width, height)
-    return spatial_bounds
+    return split_bbox(x1, y1, x2, y2, pixelsize_x, pixelsize_y, max_pixel_count)
 
 
 def split_raster_extent(raster_instance, bbox, resolution=None, max_pixel_count=1 * 10**8):
@@ -268,98 +603,299 @@ def split_raster_extent(raster_instance, bbox, resolution=None, max_pixel_count=
     else:
         pixelsize_x = resolution
         pixelsize_y = resolution
-    width = abs((x2 - x1) / pixelsize_x)
-    height = abs((y2 - y1) / pixelsize_y)
-    if not width.is_integer():
-        width = ceil(width)
-        x2 = (width * pixelsize_x) + x1
-    if not height.is_integer():
-        height = ceil(height)
-        y2 = (height * pixelsize_y) + y1
-    raster_pixel_count = width * height
-    if raster_pixel_count > max_pixel_count:
-        max_pixel_per_axis = int(sqrt(max_pixel_count))
-        columns_count = ceil(width / max_pixel_per_axis)
-        rows_count = ceil(height / max_pixel_per_axis)
-        sub_width = max_pixel_per_axis * pixelsize_x
-        sub_height = max_pixel_per_axis * pixelsize_y
-        bboxes = []
-        for column_idx in range(columns_count):
-            sub_x1 = x1 + (column_idx * sub_width)
-            sub_x2 = sub_x1 + sub_width
-            for row_idx in range(rows_count):
-                sub_y1 = y1 + (row_idx * sub_height)
-                sub_y2 = sub_y1 + sub_height
-                sub_bbox = (sub_x1, sub_y1, sub_x2, sub_y2)
-                bboxes.append(sub_bbox)
-        spatial_bounds = (bboxes, max_pixel_per_axis, max_pixel_per_axis)
-    else:
-        bboxes = [(x1, y1, x2, y2)]
-        spatial_bounds = (bboxes, width, height)
-    return spatial_bounds
+    return split_bbox(x1, y1, x2, y2, pixelsize_x, pixelsize_y, max_pixel_count)
 
 
 def get_url_raster_instance(api_key, raster_url):
     """Return raster instance from the raster URL."""
-    r = requests.get(
+    cached_validators, cached_raster = _RASTER_INSTANCES_CACHE.pop(raster_url, ({}, None))
+    r = get_lizard_session().get(
         url=raster_url,
         auth=("__key__", api_key),
+        headers=cached_validators,
     )
+    if r.status_code == 304 and cached_raster is not None:
+        # Raster metadata haven't changed since the last request, reuse the cached instance
+        _RASTER_INSTANCES_CACHE[raster_url] = (cached_validators, cached_raster)
+        return deepcopy(cached_raster)
     r.raise_for_status()
 
     raster = r.json()
+    validators = conditional_request_headers(r)
+    if validators:
+        if len(_RASTER_INSTANCES_CACHE) >= RASTER_INSTANCES_CACHE_SIZE:
+            _RASTER_INSTANCES_CACHE.pop(next(iter(_RASTER_INSTANCES_CACHE), None), None)
+        _RASTER_INSTANCES_CACHE[raster_url] = (validators, deepcopy(raster))
     return raster
 
 
-def create_raster_tasks(lizard_url, api_key, raster, spatial_bounds, projection=None, no_data=None, start_time=None):
+def get_rasters_by_uuid(lizard_url, raster_uuids, api_key=None):
+    """Return raster instances for the raster UUIDs, fetched with a single bulk request."""
+    raster_uuids = list(dict.fromkeys(raster_uuids))
+    if not raster_uuids:
+        return {}
+    matching_rasters = find_rasters(lizard_url, len(raster_uuids), api_key, uuid__in=",".join(raster_uuids))
+    rasters = {raster["uuid"]: raster for raster in matching_rasters}
+    return rasters
+
+
+def get_scenario_results(lizard_url, scenario_uuid, api_key=None):
+    """Return scenario results (result rasters and attachments)."""
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
+    url = f"{lizard_url}scenarios/{scenario_uuid}/results"
+    r = get_lizard_session().get(url=url, auth=("__key__", api_key))
+    r.raise_for_status()
+    scenario_results = r.json()["results"]
+    return scenario_results
+
+
+def get_scenario_results_rasters(lizard_url, scenario_results, api_key=None):
+    """
+    Return instances of the scenario result rasters, keyed by the raster URL.
+    Rasters are looked up with a single bulk request, rasters not found that way are fetched individually.
+    Instances of the rasters that couldn't be fetched are None.
+    """
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
+    result_rasters = {
+        result["raster"]: result["raster"].rstrip("/").rsplit("/", 1)[-1]
+        for result in scenario_results
+        if result["raster"]
+    }
+    rasters_by_uuid = get_rasters_by_uuid(lizard_url, result_rasters.values(), api_key)
+    raster_instances = {
+        raster_url: rasters_by_uuid[raster_uuid]
+        for raster_url, raster_uuid in result_rasters.items()
+        if raster_uuid in rasters_by_uuid
+    }
+    missing_rasters = [raster_url for raster_url in result_rasters if raster_url not in raster_instances]
+    # A single failing raster lookup shouldn't prevent listing the rest of the scenario results
+    missing_raster_instances = get_url_raster_instances(api_key, missing_rasters, raise_errors=False)
+    raster_instances.update(zip(missing_rasters, missing_raster_instances))
+    return raster_instances
+
+
+def get_url_raster_instances(api_key, raster_urls, max_workers=RASTER_METADATA_MAX_WORKERS, raise_errors=True):
+    """
+    Return raster instances for the raster URLs, fetched concurrently and in the same order.
+    If `raise_errors` is False, failed requests are returned as None instead of raising an exception.
+    """
+
+    def fetch_raster_instance(raster_url):
+        try:
+            return get_url_raster_instance(api_key, raster_url)
+        except requests.RequestException:
+            if raise_errors:
+                raise
+            return None
+
+    raster_urls = list(raster_urls)
+    # Rasters shared by multiple results are requested only once
+    unique_raster_urls = list(dict.fromkeys(raster_urls))
+    if len(unique_raster_urls) <= 1 or max_workers <= 1:
+        unique_rasters = [fetch_raster_instance(raster_url) for raster_url in unique_raster_urls]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_raster_urls))) as executor:
+            unique_rasters = list(executor.map(fetch_raster_instance, unique_raster_urls))
+    if len(unique_raster_urls) == len(raster_urls):
+        return unique_rasters
+    fetched_rasters = dict(zip(unique_raster_urls, unique_rasters))
+    fetched_urls = set()
+    rasters = []
+    for raster_url in raster_urls:
+        raster = fetched_rasters[raster_url]
+        # Every duplicate gets its own copy, as the instances are modified in place afterwards
+        rasters.append(deepcopy(raster) if raster_url in fetched_urls else raster)
+        fetched_urls.add(raster_url)
+    return rasters
+
+
+def create_raster_tasks(
+    lizard_url,
+    api_key,
+    raster,
+    spatial_bounds,
+    projection=None,
+    no_data=None,
+    start_time=None,
+    max_workers=RASTER_TASKS_MAX_WORKERS,
+):
     """
     Create Lizard raster task.
     Reimplemented code from https://github.com/nens/threedi-scenario-downloader
+    Tasks for the chunked raster are requested concurrently using up to `max_workers` threads.
     """
     raster_id = raster["uuid"]
     url = f"{lizard_url}rasters/{raster_id}/data/"
     bboxes, width, height = spatial_bounds
-    raster_tasks = []
-    for x1, y1, x2, y2 in bboxes:
-        bbox = f"{x1},{y1},{x2},{y2}"
-        payload = {
-            "width": width,
-            "height": height,
-            "bbox": bbox,
-            "projection": projection,
-            "format": "geotiff",
-            "async": "true",
-        }
-        if no_data is not None:
-            payload["nodata"] = no_data
-        if start_time is not None:
-            payload["start"] = start_time
-        r = requests.get(url=url, auth=("__key__", api_key), params=payload)
+    payload = {
+        "width": width,
+        "height": height,
+        "projection": projection,
+        "format": "geotiff",
+        "async": "true",
+    }
+    if no_data is not None:
+        payload["nodata"] = no_data
+    if start_time is not None:
+        payload["start"] = start_time
+    # Only the bbox differs between the tasks - prepare the rest of the request just once
+    session = get_lizard_tasks_session()
+    base_request = session.prepare_request(
+        requests.Request("GET", url=url, auth=("__key__", api_key), params=payload)
+    )
+    send_settings = session.merge_environment_settings(base_request.url, {}, None, None, None)
+    bbox_separator = "&" if "?" in base_request.url else "?"
+
+    def spawn_raster_task(task_bbox):
+        x1, y1, x2, y2 = task_bbox
+        task_request = base_request.copy()
+        task_request.url = f"{base_request.url}{bbox_separator}{urlencode({'bbox': f'{x1},{y1},{x2},{y2}'})}"
+        r = session.send(task_request, **send_settings)
         r.raise_for_status()
-        raster_task = r.json()
-        raster_tasks.append(raster_task)
+        return r.json()
+
+    if len(bboxes) == 1 or max_workers <= 1:
+        return [spawn_raster_task(bbox) for bbox in bboxes]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(bboxes))) as executor:
+        raster_tasks = list(executor.map(spawn_raster_task, bboxes))
     return raster_tasks
 
 
+def create_rasters_tasks(
+    lizard_url,
+    api_key,
+    rasters_spatial_bounds,
+    projection=None,
+    no_data=None,
+    max_workers=RASTER_TASKS_MAX_WORKERS,
+):
+    """
+    Create Lizard raster tasks for each of the (raster, spatial_bounds) pairs.
+    Tasks of the different rasters are requested concurrently, sharing the `max_workers` threads limit.
+    Return list of the created tasks lists, in the order of the given pairs.
+    """
+    rasters_spatial_bounds = list(rasters_spatial_bounds)
+    rasters_workers = min(max_workers, len(rasters_spatial_bounds))
+    # Split the threads between the rasters and the chunks of each raster
+    chunks_workers = max(1, max_workers // max(rasters_workers, 1))
+
+    def spawn_tasks(raster_spatial_bounds):
+        raster, spatial_bounds = raster_spatial_bounds
+        return create_raster_tasks(
+            lizard_url, api_key, raster, spatial_bounds, projection, no_data, max_workers=chunks_workers
+        )
+
+    if rasters_workers <= 1:
+        return [spawn_tasks(raster_spatial_bounds) for raster_spatial_bounds in rasters_spatial_bounds]
+    with ThreadPoolExecutor(max_workers=rasters_workers) as executor:
+        rasters_tasks = list(executor.map(spawn_tasks, rasters_spatial_bounds))
+    return rasters_tasks
+
+
+def get_task_instance(lizard_url, task_id, api_key=None):
+    """Get Lizard task instance (including the task status and result)."""
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
+    url = f"{lizard_url}tasks/{task_id}/"
+    r = get_lizard_session().get(url=url, auth=("__key__", api_key))
+    r.raise_for_status()
+    return r.json()
+
+
+def get_task_instances(lizard_url, task_ids, api_key=None):
+    """
+    Get Lizard task instances of the given tasks, looking them up with a single request where possible.
+    Tasks missing from the bulk lookup response (or all of them, if the bulk lookup fails) are requested one by one.
+    If the server turns out to ignore the bulk lookup filter, the bulk lookup is not used for it anymore.
+    Tasks which can't be fetched at all are returned with the "UNKNOWN" status.
+    """
+    if api_key is None:
+        api_key = get_api_key_auth_manager()
+    task_ids = list(task_ids)
+    task_instances = {}
+    if len(task_ids) > 1 and lizard_url not in _TASKS_BULK_LOOKUP_UNSUPPORTED:
+        try:
+            tasks = find_with_count(lizard_url, "tasks", len(task_ids), api_key, uuid__in=",".join(task_ids))[1]
+            requested_task_ids = set(task_ids)
+            if all(task["uuid"] in requested_task_ids for task in tasks):
+                task_instances.update((task["uuid"], task) for task in tasks)
+            else:
+                # Unfiltered listing - the returned tasks can't be trusted to cover the requested ones
+                _TASKS_BULK_LOOKUP_UNSUPPORTED.add(lizard_url)
+        except (requests.RequestException, KeyError, ValueError):
+            pass
+    for task_id in task_ids:
+        if task_id in task_instances:
+            continue
+        try:
+            task_instances[task_id] = get_task_instance(lizard_url, task_id, api_key)
+        except requests.RequestException:
+            task_instances[task_id] = {"uuid": task_id, "status": "UNKNOWN"}
+    return task_instances
+
+
 def build_vrt(output_filepath, raster_filepaths, **vrt_options):
     """Build VRT for the list of rasters."""
+    from osgeo import gdal
+
     options = gdal.BuildVRTOptions(**vrt_options)
     vrt_ds = gdal.BuildVRT(output_filepath, raster_filepaths, options=options)
+    if vrt_ds is None:
+        raise RuntimeError(f"Building VRT '{output_filepath}' failed: {gdal.GetLastErrorMsg()}")
+    vrt_ds.FlushCache()
     vrt_ds = None
 
 
+@lru_cache(maxsize=64)
+def crs_from_ogc_wms(projection):
+    """Return (cached) coordinate reference system matching the OGC WMS CRS definition (e.g. 'EPSG:28992')."""
+    return QgsCoordinateReferenceSystem.fromOgcWmsCrs(projection)
+
+
+def get_coordinate_transform(src_crs, dst_crs):
+    """Return (cached) coordinate transformation from source CRS to destination CRS."""
+    transform_key = (src_crs.authid(), dst_crs.authid())
+    if not all(transform_key):
+        # Custom CRS without authority identifier - cannot be cached reliably
+        transform_context = QgsProject.instance().transformContext()
+        return QgsCoordinateTransform(src_crs, dst_crs, transform_context)
+    try:
+        transformation = _TRANSFORM_CACHE[transform_key]
+    except KeyError:
+        transform_context = QgsProject.instance().transformContext()
+        transformation = QgsCoordinateTransform(src_crs, dst_crs, transform_context)
+        _TRANSFORM_CACHE[transform_key] = transformation
+    return transformation
+
+
+def clear_transform_cache():
+    """Clear cached coordinate transformations."""
+    _TRANSFORM_CACHE.clear()
+
+
+def clear_raster_instances_cache():
+    """Clear cached raster instances and their validators."""
+    _RASTER_INSTANCES_CACHE.clear()
+
+
 def reproject_geometry(geometry, src_crs, dst_crs, transformation=None):
     """Reproject geometry from source CRS to destination CRS."""
     if src_crs == dst_crs:
         return geometry
     if transformation is None:
-        project = QgsProject.instance()
-        transform_context = project.transformContext()
-        transformation = QgsCoordinateTransform(src_crs, dst_crs, transform_context)
+        transformation = get_coordinate_transform(src_crs, dst_crs)
     geometry.transform(transformation)
     return geometry
 
 
+def geometry_bbox(geometry):
+    """Return geometry bounding box as a [x_min, y_min, x_max, y_max] list."""
+    bbox = geometry.boundingBox()
+    return [bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()]
+
+
 def unify_spatial_boundaries(dataset_instance, source_crs, destination_crs):
     """Unify spatial boundaries of derived dataset instance (scenario or raster)."""
     dataset_boundaries = [("origin_x", "origin_y"), ("upper_bound_x", "upper_bound_y")]
@@ -377,20 +913,31 @@ def unify_spatial_boundaries(dataset_instance, source_crs, destination_crs):
         dataset_instance[y_coord_name] = dst_y_coord
 
 
+def memory_polygon_layer(geometry_type="Polygon", polygon_layer_name="clip_layer", epsg="EPSG:4326"):
+    """Spawn empty (multi)polygon memory layer."""
+    uri = f"{geometry_type}?crs={epsg}&field=id:integer"
+    polygon_layer = QgsVectorLayer(uri, polygon_layer_name, "memory")
+    return polygon_layer
+
+
+def add_polygon_features(polygon_layer, polygon_geometries):
+    """Add (multi)polygon geometries straight into the layer data provider (bypassing the edit buffer)."""
+    fields = polygon_layer.fields()
+    polygon_features = []
+    for polygon_geometry in polygon_geometries:
+        polygon_feat = QgsFeature(fields)
+        polygon_feat.setGeometry(polygon_geometry)
+        polygon_features.append(polygon_feat)
+    polygon_layer.dataProvider().addFeatures(polygon_features, QgsFeatureSink.FastInsert)
+    polygon_layer.updateExtents()
+
+
 def wkt_polygon_layer(polygon_wkt, polygon_layer_name="clip_layer", epsg="EPSG:4326"):
     """Spawn (multi)polygon layer out of single WKT polygon geometry."""
     geometry_type = "MultiPolygon" if polygon_wkt.lower().startswith("multi") else "Polygon"
-    uri = f"{geometry_type}?crs={epsg}"
-    memory_polygon_layer = QgsVectorLayer(uri, polygon_layer_name, "memory")
-    memory_polygon_layer_dt = memory_polygon_layer.dataProvider()
-    memory_polygon_layer_dt.addAttributes([QgsField("id", QVariant.Int)])
-    memory_polygon_layer.updateFields()
-    cut_line_feat = QgsFeature(memory_polygon_layer.fields())
-    cut_line_feat.setGeometry(QgsGeometry.fromWkt(polygon_wkt))
-    memory_polygon_layer.startEditing()
-    memory_polygon_layer.addFeature(cut_line_feat)
-    memory_polygon_layer.commitChanges()
-    return memory_polygon_layer
+    polygon_layer = memory_polygon_layer(geometry_type, polygon_layer_name, epsg)
+    add_polygon_features(polygon_layer, [QgsGeometry.fromWkt(polygon_wkt)])
+    return polygon_layer
 
 
 def layer_to_gpkg(layer, gpkg_filename, overwrite=False, driver_name="GPKG"):
@@ -400,8 +947,7 @@ def layer_to_gpkg(layer, gpkg_filename, overwrite=False, driver_name="GPKG"):
     options.actionOnExistingFile = (
         QgsVectorFileWriter.CreateOrOverwriteLayer if overwrite is False else QgsVectorFileWriter.CreateOrOverwriteFile
     )
-    fields = layer.fields()
-    valid_indexes = [fields.lookupField(fname) for fname in fields.names() if fname != "fid"]
+    valid_indexes = [idx for idx, fname in enumerate(layer.fields().names()) if fname != "fid"]
     options.attributes = valid_indexes
     options.driverName = driver_name
     options.layerName = layer.name()
@@ -411,21 +957,39 @@ def layer_to_gpkg(layer, gpkg_filename, overwrite=False, driver_name="GPKG"):
 
 def clip_raster(raster_src, polygon_clip_gpkg, polygon_clip_layer="clip_layer", no_data=-9999):
     """Clip raster with given polygon geometry."""
+    clip_rasters([raster_src], polygon_clip_gpkg, polygon_clip_layer, no_data)
+
+
+def clip_rasters(raster_sources, polygon_clip_gpkg, polygon_clip_layer="clip_layer", no_data=-9999):
+    """Clip rasters with given polygon geometry (sharing the same warp options)."""
+    from osgeo import gdal
+
     warp_options = gdal.WarpOptions(
         dstNodata=no_data,
         cutlineDSName=polygon_clip_gpkg,
         cutlineLayer=polygon_clip_layer,
         cropToCutline=True,
         multithread=True,
-        creationOptions=["COMPRESS=DEFLATE", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512"],
+        warpMemoryLimit=CLIP_WARP_MEMORY_LIMIT,
+        creationOptions=[
+            "COMPRESS=DEFLATE",
+            "TILED=YES",
+            "BLOCKXSIZE=512",
+            "BLOCKYSIZE=512",
+            "BIGTIFF=IF_SAFER",
+            "NUM_THREADS=ALL_CPUS",
+        ],
         warpOptions=["NUM_THREADS=ALL_CPUS"],
     )
-    raster_location = os.path.dirname(raster_src)
-    raster_filename = os.path.basename(raster_src)
-    raster_dst = os.path.join(raster_location, f"clip_{raster_filename}")
-    gdal.Warp(raster_dst, raster_src, options=warp_options)
-    os.remove(raster_src)
-    os.rename(raster_dst, raster_src)
+    for raster_src in raster_sources:
+        raster_location = os.path.dirname(raster_src)
+        raster_filename = os.path.basename(raster_src)
+        raster_dst = os.path.join(raster_location, f"clip_{raster_filename}")
+        clipped_ds = gdal.Warp(raster_dst, raster_src, options=warp_options)
+        if clipped_ds is None:
+            raise RuntimeError(f"Clipping raster '{raster_src}' failed: {gdal.GetLastErrorMsg()}")
+        clipped_ds = None
+        os.replace(raster_dst, raster_src)
 
 
 def translate_illegal_chars(text, illegal_characters=r'\/:*?"<>|', replacement_character="-"):
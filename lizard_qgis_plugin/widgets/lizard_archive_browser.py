@@ -1,43 +1,49 @@
 # Lizard plugin for QGIS, licensed under GPLv2 or (at your option) any later version
 # Copyright (C) 2023 by Lutra Consulting for 3Di Water Management
 import os
+import time
+from collections import OrderedDict
 from copy import deepcopy
+from itertools import count
 from math import ceil
-from operator import itemgetter
 
 from qgis.core import (
     Qgis,
-    QgsCoordinateReferenceSystem,
+    QgsFeatureRequest,
     QgsFieldProxyModel,
     QgsGeometry,
     QgsMapLayerProxyModel,
     QgsProject,
     QgsRasterLayer,
-    QgsRectangle,
 )
 from qgis.PyQt import uic
-from qgis.PyQt.QtCore import QSettings, QSize, Qt, QTimer
+from qgis.PyQt.QtCore import QSettings, QSize, Qt, QThreadPool, QTimer
 from qgis.PyQt.QtGui import QBrush, QColor, QStandardItem, QStandardItemModel
-from qgis.PyQt.QtWidgets import QCheckBox, QDialog, QFileDialog
-from qgis.utils import plugins
-from threedi_mi_utils import LocalRevision, LocalSchematisation, list_local_schematisations
+from qgis.PyQt.QtWidgets import QDialog, QFileDialog
 
 from lizard_qgis_plugin.utils import (
     RASTER_FALLBACK_RESOLUTION,
-    WMSServiceException,
-    add_layer_to_group,
-    count_rasters_with_name,
-    count_scenarios_with_name,
+    add_layers_to_group,
+    api_key_fingerprint,
     create_tree_group,
-    find_rasters,
-    get_capabilities_layer_uris,
-    get_url_raster_instance,
+    crs_from_ogc_wms,
+    geometry_bbox,
+    get_coordinate_transform,
+    get_threedi_auth,
+    layers_extent,
     reproject_geometry,
     try_to_write,
     unify_spatial_boundaries,
 )
-from lizard_qgis_plugin.workers import RasterDownloader, ScenarioItemsDownloader
+from lizard_qgis_plugin.workers import (
+    LizardListFetcher,
+    RasterDownloader,
+    ScenarioItemsDownloader,
+    ScenarioResultsFetcher,
+    WMSLayersFetcher,
+)
 
+SPACE_TO_UNDERSCORE = str.maketrans(" ", "_")
 base_dir = os.path.dirname(__file__)
 lizard_uicls, lizard_basecls = uic.loadUiType(os.path.join(base_dir, "ui", "lizard.ui"))
 download_settings_uicls, download_settings_basecls = uic.loadUiType(
@@ -45,6 +51,46 @@ download_settings_uicls, download_settings_basecls = uic.loadUiType(
 )
 
 
+def populate_view(view, rows):
+    """
+    Populate the view model with the rows of items (allocating all the rows at once)
+    and fit the columns to the contents, without intermediate repaints.
+    """
+    model = view.model()
+    view.setUpdatesEnabled(False)
+    try:
+        model.setRowCount(len(rows))
+        for row_number, row_items in enumerate(rows):
+            for column_number, item in enumerate(row_items):
+                model.setItem(row_number, column_number, item)
+        for column_number in range(model.columnCount()):
+            view.resizeColumnToContents(column_number)
+    finally:
+        view.setUpdatesEnabled(True)
+
+
+def populate_view_texts(view, rows):
+    """
+    Populate the view model with the rows of item texts.
+    If the number of listed rows doesn't change (e.g. on switching between the full pages),
+    the existing items are updated in place instead of being replaced with the new ones.
+    """
+    model = view.model()
+    view.selectionModel().clear()
+    if model.rowCount() != len(rows):
+        populate_view(view, [[QStandardItem(text) for text in row_texts] for row_texts in rows])
+        return
+    view.setUpdatesEnabled(False)
+    try:
+        for row_number, row_texts in enumerate(rows):
+            for column_number, text in enumerate(row_texts):
+                model.item(row_number, column_number).setText(text)
+        for column_number in range(model.columnCount()):
+            view.resizeColumnToContents(column_number)
+    finally:
+        view.setUpdatesEnabled(True)
+
+
 class RasterDownloadSettings(download_settings_uicls, download_settings_basecls):
     def __init__(self, lizard_browser, parent=None):
         super().__init__(parent)
@@ -52,21 +98,23 @@ class RasterDownloadSettings(download_settings_uicls, download_settings_basecls)
         self.lizard_browser = lizard_browser
         self.clip_polygon_cbo.setFilters(QgsMapLayerProxyModel.PolygonLayer)
         self.clip_name_field_cbo.setFilters(QgsFieldProxyModel.String)
-        self.output_dir_raster.fileChanged.connect(self.on_output_dir_changed)
         self.use_polygon_extent_rb.toggled.connect(self.on_extent_changed)
         self.clip_polygon_cbo.layerChanged.connect(self.on_polygon_changed)
         self.clip_name_field_cbo.setLayer(self.clip_polygon_cbo.currentLayer())
         self.accept_pb.clicked.connect(self.accept)
         self.cancel_pb.clicked.connect(self.reject)
-        lizard_output_dir = QSettings().value("threedi/last_lizard_output_dir", "", type=str)
-        if lizard_output_dir:
-            self.output_dir_raster.setFilePath(lizard_output_dir)
+        self.lizard_output_dir = QSettings().value("threedi/last_lizard_output_dir", "", type=str)
+        if self.lizard_output_dir:
+            self.output_dir_raster.setFilePath(self.lizard_output_dir)
         self.populate_selected_raster_settings()
 
-    def on_output_dir_changed(self):
-        """Save the last output dir path."""
+    def accept(self):
+        """Save the last output dir path on accepting the settings."""
         output_dir_filepath = self.output_dir_raster.filePath()
-        QSettings().setValue("threedi/last_lizard_output_dir", output_dir_filepath)
+        if output_dir_filepath != self.lizard_output_dir:
+            QSettings().setValue("threedi/last_lizard_output_dir", output_dir_filepath)
+            self.lizard_output_dir = output_dir_filepath
+        super().accept()
 
     def on_extent_changed(self):
         """Enable/disable polygon settings group."""
@@ -93,7 +141,7 @@ class RasterDownloadSettings(download_settings_uicls, download_settings_basecls)
                 raster_uuid = raster_uuid_item.text()
                 raster_instance = self.lizard_browser.current_raster_instances[raster_uuid]
                 self.filename_le_raster.setText(raster_instance["name"])
-                raster_crs = QgsCoordinateReferenceSystem.fromOgcWmsCrs(raster_instance["projection"])
+                raster_crs = crs_from_ogc_wms(raster_instance["projection"])
                 self.crs_widget_raster.setCrs(raster_crs)
                 raster_resolution = raster_instance["pixelsize_x"]
                 self.pixel_size_sbox_raster.setValue(
@@ -108,25 +156,63 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
     RASTER_NAME_COLUMN_IDX = 1
     RASTER_UUID_COLUMN_IDX = 5
     MAX_THREAD_COUNT = 1
+    MAX_FETCH_THREAD_COUNT = 2
+    PAGE_CHANGE_DEBOUNCE_INTERVAL = 250  # ms
+    PAGES_CACHE_SIZE = 8
+    PAGES_CACHE_TTL = 30  # s
+    SCENARIO_RESULTS_CACHE_SIZE = 16
+    LAYER_FILE_EXTENSIONS = (".tif", ".vrt")
+    FEEDBACK_MAX_ROWS = 500
 
     def __init__(self, plugin, parent=None):
         super().__init__(parent)
         self.setupUi(self)
         self.plugin = plugin
         self.scenario_model = QStandardItemModel()
+        self.scenario_model.setHorizontalHeaderLabels(
+            ["Scenario name", "Model name", "Organisation", "User", "Created", "UUID"]
+        )
         self.scenario_tv.setModel(self.scenario_model)
         self.scenario_results_model = QStandardItemModel()
+        self.scenario_results_model.setHorizontalHeaderLabels(["Item", "File name"])
         self.scenario_results_tv.setModel(self.scenario_results_model)
         self.raster_model = QStandardItemModel()
+        self.raster_model.setHorizontalHeaderLabels(["🕒", "Name", "Description", "Organisation", "Last update", "UUID"])
         self.raster_tv.setModel(self.raster_model)
         self.feedback_model = QStandardItemModel()
         self.feedback_lv.setModel(self.feedback_model)
+        self.feedback_brushes = {Qgis.Info: QBrush(QColor(Qt.darkGreen)), Qgis.Warning: QBrush(QColor(Qt.darkYellow))}
+        self.feedback_error_brush = QBrush(QColor(Qt.red))
         self.current_scenario_instances = {}
         self.current_scenario_results = {}
         self.current_raster_instances = {}
+        self.raster_download_settings_dlg = None
+        self.lizard_fetcher_pool = QThreadPool(self)
+        self.lizard_fetcher_pool.setMaxThreadCount(self.MAX_FETCH_THREAD_COUNT)
+        # Only the results of the latest fetch are shown, results of the outdated ones are dropped
+        self.fetch_ids = count(1)
+        self.scenarios_fetch_id = 0
+        self.rasters_fetch_id = 0
+        self.results_fetch_id = 0
+        # Recently listed and prefetched pages, keyed by the searched text and the page number.
+        # Pages are reused for PAGES_CACHE_TTL seconds, so repeating a recent search doesn't hit the API again.
+        self.scenario_pages_cache = OrderedDict()
+        self.raster_pages_cache = OrderedDict()
+        # Results with their raster instances of the recently shown scenarios
+        self.scenario_results_cache = OrderedDict()
+        self.listed_results_scenario_uuid = None
+        # Page changes are debounced, so quickly stepping through the pages only fetches the last one
+        self.scenario_page_timer = QTimer(self)
+        self.scenario_page_timer.setSingleShot(True)
+        self.scenario_page_timer.setInterval(self.PAGE_CHANGE_DEBOUNCE_INTERVAL)
+        self.scenario_page_timer.timeout.connect(self.fetch_scenarios)
+        self.raster_page_timer = QTimer(self)
+        self.raster_page_timer.setSingleShot(True)
+        self.raster_page_timer.setInterval(self.PAGE_CHANGE_DEBOUNCE_INTERVAL)
+        self.raster_page_timer.timeout.connect(self.fetch_rasters)
         self.pb_prev_page.clicked.connect(self.previous_scenarios)
         self.pb_next_page.clicked.connect(self.next_scenarios)
-        self.page_sbox.valueChanged.connect(self.fetch_scenarios)
+        self.page_sbox.valueChanged.connect(self.scenario_page_timer.start)
         self.pb_add_wms.clicked.connect(self.load_scenario_as_wms_layers)
         self.pb_show_files.clicked.connect(self.fetch_results)
         self.pb_download.clicked.connect(self.download_results)
@@ -135,7 +221,7 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
         self.scenario_tv.selectionModel().selectionChanged.connect(self.toggle_scenario_selected)
         self.pb_prev_page_raster.clicked.connect(self.previous_rasters)
         self.pb_next_page_raster.clicked.connect(self.next_rasters)
-        self.page_sbox_raster.valueChanged.connect(self.fetch_rasters)
+        self.page_sbox_raster.valueChanged.connect(self.raster_page_timer.start)
         self.pb_add_wms_raster.clicked.connect(self.load_raster_as_wms_layers)
         self.pb_download_raster.clicked.connect(self.download_raster_file)
         self.raster_search_le.returnPressed.connect(self.search_for_rasters)
@@ -148,21 +234,20 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
 
     def log_feedback(self, feedback_message, level=Qgis.Info):
         """Log messages in the feedback list view."""
-        if level == Qgis.Info:
-            color = QColor(Qt.darkGreen)
-        elif level == Qgis.Warning:
-            color = QColor(Qt.darkYellow)
-        else:
-            color = QColor(Qt.red)
-        brush = QBrush(color)
+        brush = self.feedback_brushes.get(level, self.feedback_error_brush)
         feedback_item = QStandardItem(feedback_message)
         feedback_item.setForeground(brush)
         self.feedback_model.appendRow([feedback_item])
+        excess_rows_count = self.feedback_model.rowCount() - self.FEEDBACK_MAX_ROWS
+        if excess_rows_count > 0:
+            self.feedback_model.removeRows(0, excess_rows_count)
 
     def toggle_scenario_selected(self):
         """Toggle action widgets if any scenario is selected."""
-        self.scenario_results_model.clear()
+        self.scenario_results_model.setRowCount(0)
         self.current_scenario_results.clear()
+        self.listed_results_scenario_uuid = None
+        self.results_fetch_id = 0  # Drop results still being fetched for the previously selected scenario
         self.pb_download.setDisabled(True)
         self.grp_raster_settings.setDisabled(True)
         self.toggle_selection_ckb.setChecked(False)
@@ -185,17 +270,17 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
 
     def search_for_scenarios(self):
         """Method used for searching scenarios with text typed withing search bar."""
-        self.page_sbox.valueChanged.disconnect(self.fetch_scenarios)
         self.page_sbox.setValue(1)
-        self.page_sbox.valueChanged.connect(self.fetch_scenarios)
+        self.scenario_page_timer.stop()
         self.fetch_scenarios()
 
     def toggle_results(self, checked):
         """Select/deselect all available scenario items."""
+        check_state = Qt.Checked if checked else Qt.Unchecked
         for result in self.current_scenario_results.values():
-            checkbox = result["checkbox"]
-            if checkbox.isEnabled():
-                checkbox.setChecked(checked)
+            result_item = self.scenario_results_model.item(result["row"], 0)
+            if result_item.isEnabled():
+                result_item.setCheckState(check_state)
 
     def select_download_directory(self):
         """Select download directory path widget."""
@@ -211,144 +296,242 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
                 return
             return download_dir
 
-    def discover_download_directory(self, scenario_instance):
-        """Discover download directory."""
+    def discover_download_directory(self):
+        """Discover download (working) directory."""
         working_dir = QSettings().value("threedi/working_dir", "", type=str)
         if not working_dir:
             working_dir = self.select_download_directory()
-        download_dir = working_dir
-        model_id = scenario_instance["model_identifier"]
-        if not model_id:
-            return download_dir
-        try:
-            import threedi_models_and_simulations.api_calls.threedi_calls as tc
-            import threedi_models_and_simulations.deps.custom_imports as ci
+        return working_dir
 
-            ci.patch_wheel_imports()
-            threedi_models_and_simulations = plugins["threedi_models_and_simulations"]
-        except (AttributeError, ImportError):
-            return download_dir
-        ms_settings = threedi_models_and_simulations.plugin_settings
-        username, personal_api_token = ms_settings.get_3di_auth()
-        threedi_api = tc.get_api_client_with_personal_api_token(personal_api_token, ms_settings.api_url)
-        threedi_api_calls = tc.ThreediCalls(threedi_api)
+    def fetch_scenarios(self):
+        """Fetch matching scenarios in the background."""
+        self.scenarios_fetch_id = next(self.fetch_ids)
+        self.fetch_page(
+            self.scenarios_fetch_id,
+            "scenarios",
+            self.scenario_pages_cache,
+            self.scenario_search_le.text(),
+            self.page_sbox,
+            self.list_scenarios,
+        )
+
+    def fetch_page(self, fetch_id, endpoint, pages_cache, searched_text, page_sbox, on_page_fetched):
+        """Fetch the current page of the matching endpoint items and prefetch the adjacent pages."""
         try:
-            local_schematisations = list_local_schematisations(working_dir)
-            model_3di = threedi_api_calls.fetch_3di_model(int(model_id))
-            model_schematisation_id = model_3di.schematisation_id
-            if model_schematisation_id:
-                model_schematisation_name = model_3di.schematisation_name
-                model_revision_number = model_3di.revision_number
-                try:
-                    local_schematisation = local_schematisations[model_schematisation_id]
-                except KeyError:
-                    local_schematisation = LocalSchematisation(
-                        working_dir, model_schematisation_id, model_schematisation_name, create=True
-                    )
-                try:
-                    local_revision = local_schematisation.revisions[model_revision_number]
-                except KeyError:
-                    local_revision = LocalRevision(local_schematisation, model_revision_number)
-                    local_revision.make_revision_structure()
-                download_dir = local_revision.results_dir
+            api_key = self.plugin.downloader.get_api_key()
         except Exception as e:
-            warn_msg = f"Failed to set proper schematisation revision results folder due to the following error: {e}."
-            self.plugin.communication.log_warn(warn_msg)
-            download_dir = working_dir
-        return download_dir
+            self.on_fetch_failed(fetch_id, f"Error: {e}")
+            return
+        api_url = self.plugin.settings.api_url
+        page_nr = page_sbox.value()
+        # Pages of the different Lizard servers or credentials are cached separately
+        credentials_key = api_key_fingerprint(api_key)
+        page_key = (api_url, credentials_key, searched_text, page_nr)
+        cached_page = self.cached_page(pages_cache, page_key)
+        if cached_page is not None:
+            on_page_fetched(fetch_id, *cached_page)
+        else:
+            page_fetcher = self.page_fetcher(fetch_id, endpoint, pages_cache, page_key, api_key)
+            page_fetcher.signals.fetch_finished.connect(on_page_fetched)
+            page_fetcher.signals.fetch_failed.connect(self.on_fetch_failed)
+            self.lizard_fetcher_pool.start(page_fetcher)
+        for adjacent_page_nr in (page_nr + 1, page_nr - 1):
+            if not 1 <= adjacent_page_nr <= page_sbox.maximum():
+                continue
+            adjacent_page_key = (api_url, credentials_key, searched_text, adjacent_page_nr)
+            if self.cached_page(pages_cache, adjacent_page_key) is not None:
+                continue
+            # Prefetch failures are not reported, the page will be fetched again when requested
+            page_prefetcher = self.page_fetcher(0, endpoint, pages_cache, adjacent_page_key, api_key)
+            self.lizard_fetcher_pool.start(page_prefetcher)
+
+    def page_fetcher(self, fetch_id, endpoint, pages_cache, page_key, api_key):
+        """
+        Create a worker fetching the page of the matching endpoint items into the pages cache.
+        The `page_key` is the (api_url, credentials_key, searched_text, page_nr) tuple.
+        """
+        api_url, _credentials_key, searched_text, page_nr = page_key
+        page_fetcher = LizardListFetcher(
+            fetch_id,
+            api_url,
+            endpoint,
+            self.TABLE_LIMIT,
+            api_key,
+            offset=(page_nr - 1) * self.TABLE_LIMIT,
+            name__icontains=searched_text,
+            ordering="-created",
+        )
+        page_fetcher.signals.fetch_finished.connect(
+            lambda _fetch_id, results_count, results: self.cache_page(pages_cache, page_key, results_count, results)
+        )
+        return page_fetcher
 
-    def fetch_scenarios(self):
-        """Fetch and list matching scenarios."""
+    def cached_page(self, pages_cache, page_key):
+        """Return cached (results count, results) of the page if not expired yet, otherwise return None."""
+        try:
+            cached_time, results_count, results = pages_cache[page_key]
+        except KeyError:
+            return None
+        if time.monotonic() - cached_time >= self.PAGES_CACHE_TTL:
+            del pages_cache[page_key]
+            return None
+        pages_cache.move_to_end(page_key)
+        return results_count, results
+
+    def cache_page(self, pages_cache, page_key, results_count, results):
+        """Add fetched page to the pages cache, dropping the outdated and least recently used pages."""
+        search_key = page_key[:-1]  # Lizard server, credentials and searched text
+        outdated_page_keys = [
+            cached_page_key
+            for cached_page_key, (cached_time, cached_results_count, cached_results) in pages_cache.items()
+            if cached_page_key[:-1] == search_key and cached_results_count != results_count
+        ]
+        for outdated_page_key in outdated_page_keys:
+            # Matching items count changed since these pages were fetched, so their content is shifted
+            del pages_cache[outdated_page_key]
+        pages_cache[page_key] = (time.monotonic(), results_count, results)
+        pages_cache.move_to_end(page_key)
+        while len(pages_cache) > self.PAGES_CACHE_SIZE:
+            pages_cache.popitem(last=False)
+
+    def list_scenarios(self, fetch_id, matching_scenarios_count, matching_scenarios):
+        """List fetched matching scenarios."""
+        if fetch_id != self.scenarios_fetch_id:
+            return
         try:
-            searched_text = self.scenario_search_le.text()
-            matching_scenarios_count = count_scenarios_with_name(self.plugin.settings.api_url, searched_text)
             pages_nr = ceil(matching_scenarios_count / self.TABLE_LIMIT) or 1
             self.page_sbox.setMaximum(pages_nr)
             self.page_sbox.setSuffix(f" / {pages_nr}")
             self.current_scenario_instances.clear()
-            self.scenario_model.clear()
             self.current_scenario_results.clear()
-            self.scenario_results_model.clear()
-            offset = (self.page_sbox.value() - 1) * self.TABLE_LIMIT
-            header = ["Scenario name", "Model name", "Organisation", "User", "Created", "UUID"]
-            self.scenario_model.setHorizontalHeaderLabels(header)
-            matching_scenarios = self.plugin.downloader.find_scenarios(
-                self.TABLE_LIMIT, offset=offset, name__icontains=searched_text
-            )
-            for scenario_instance in sorted(matching_scenarios, key=itemgetter("created"), reverse=True):
+            self.scenario_results_model.setRowCount(0)
+            self.listed_results_scenario_uuid = None
+            scenario_rows = []
+            for scenario_instance in matching_scenarios:
                 scenario_uuid = scenario_instance["uuid"]
-                uuid_item = QStandardItem(scenario_uuid)
-                name_item = QStandardItem(scenario_instance["name"])
-                model_name_item = QStandardItem(scenario_instance["model_name"])
-                organisation_item = QStandardItem(scenario_instance["organisation"]["name"])
-                user_item = QStandardItem(scenario_instance["supplier"])
-                created_item = QStandardItem(scenario_instance["created"].split("T")[0])
-                scenario_items = [name_item, model_name_item, organisation_item, user_item, created_item, uuid_item]
-                self.scenario_model.appendRow(scenario_items)
+                scenario_texts = [
+                    scenario_instance["name"],
+                    scenario_instance["model_name"],
+                    scenario_instance["organisation"]["name"],
+                    scenario_instance["supplier"],
+                    scenario_instance["created"].split("T")[0],
+                    scenario_uuid,
+                ]
+                scenario_rows.append(scenario_texts)
                 self.current_scenario_instances[scenario_uuid] = scenario_instance
-            for i in range(len(header)):
-                self.scenario_tv.resizeColumnToContents(i)
+            populate_view_texts(self.scenario_tv, scenario_rows)
         except Exception as e:
-            self.close()
-            error_msg = f"Error: {e}"
-            self.plugin.communication.show_error(error_msg)
+            self.on_fetch_failed(fetch_id, f"Error: {e}")
+
+    def on_fetch_failed(self, fetch_id, error_message):
+        """Feedback on the failed fetch of the matching items."""
+        if fetch_id not in (self.scenarios_fetch_id, self.rasters_fetch_id):
+            return
+        self.close()
+        self.plugin.communication.show_error(error_message)
+
+    def cache_scenario_results(self, results_key, scenario_results, raster_instances):
+        """
+        Add fetched scenario results to the cache, dropping the least recently used ones.
+        The `results_key` is the (api_url, credentials_key, scenario_uuid) tuple.
+        """
+        if None in raster_instances.values():
+            return  # Some of the result rasters couldn't be fetched, retry on the next request
+        self.scenario_results_cache[results_key] = scenario_results, raster_instances
+        self.scenario_results_cache.move_to_end(results_key)
+        while len(self.scenario_results_cache) > self.SCENARIO_RESULTS_CACHE_SIZE:
+            self.scenario_results_cache.popitem(last=False)
 
     def fetch_results(self):
-        """Fetch and show selected available scenario result files."""
+        """Fetch selected scenario available result files in the background."""
         index = self.scenario_tv.currentIndex()
         if not index.isValid():
             return
         current_row = index.row()
         scenario_uuid_item = self.scenario_model.item(current_row, self.SCENARIO_UUID_COLUMN_IDX)
         scenario_uuid = scenario_uuid_item.text()
-        scenario_instance = self.current_scenario_instances[scenario_uuid]
-        scenario_results = self.plugin.downloader.get_scenario_instance_results(scenario_uuid)
+        if scenario_uuid == self.listed_results_scenario_uuid:
+            return  # Results of the selected scenario are already listed
+        self.results_fetch_id = next(self.fetch_ids)
+        try:
+            api_key = self.plugin.downloader.get_api_key()
+        except Exception as e:
+            self.on_results_fetch_failed(self.results_fetch_id, f"Error: {e}")
+            return
+        api_url = self.plugin.settings.api_url
+        results_key = (api_url, api_key_fingerprint(api_key), scenario_uuid)
+        if results_key in self.scenario_results_cache:
+            self.scenario_results_cache.move_to_end(results_key)
+            self.list_results(self.results_fetch_id, scenario_uuid, *self.scenario_results_cache[results_key])
+            return
+        results_fetcher = ScenarioResultsFetcher(self.results_fetch_id, api_url, scenario_uuid, api_key)
+        results_fetcher.signals.fetch_finished.connect(
+            lambda _fetch_id, _scenario_uuid, scenario_results, raster_instances: self.cache_scenario_results(
+                results_key, scenario_results, raster_instances
+            )
+        )
+        results_fetcher.signals.fetch_finished.connect(self.list_results)
+        results_fetcher.signals.fetch_failed.connect(self.on_results_fetch_failed)
+        self.lizard_fetcher_pool.start(results_fetcher)
+
+    def on_results_fetch_failed(self, fetch_id, error_message):
+        """Feedback on the failed fetch of the scenario results."""
+        if fetch_id != self.results_fetch_id:
+            return
+        self.log_feedback(error_message, Qgis.Critical)
+        self.plugin.communication.show_error(error_message)
+
+    def list_results(self, fetch_id, scenario_uuid, scenario_results, raster_instances):
+        """Show fetched scenario available result files."""
+        if fetch_id != self.results_fetch_id:
+            return
+        scenario_instance = self.current_scenario_instances.get(scenario_uuid)
+        if scenario_instance is None:
+            return  # Scenario is no longer listed
         self.current_scenario_results.clear()
-        self.scenario_results_model.clear()
-        header, checkboxes_width = ["Item", "File name"], []
-        self.scenario_results_model.setHorizontalHeaderLabels(header)
-        for row_number, result in enumerate(scenario_results, start=0):
+        self.scenario_results_model.setRowCount(0)
+        result_rows = []
+        for row_number, result in enumerate(scenario_results):
+            result = dict(result)
             result_enabled = True
             result_id = result["id"]
             result_name = result["name"]
             result_attachment_url = result["attachment_url"]
             result_raster = result["raster"]
             if result_raster:
-                raster_instance = get_url_raster_instance(self.plugin.downloader.get_api_key(), result_raster)
-                if raster_instance["temporal"]:
+                raster_instance = raster_instances[result_raster]
+                if raster_instance is not None and raster_instance["temporal"]:
                     result_enabled = False
-                    result_filename = result_name.lower().replace("(timeseries)", "").strip().replace(" ", "_") + ".tif"
+                    result_basename = result_name.lower().replace("(timeseries)", "").strip()
+                    result_filename = result_basename.translate(SPACE_TO_UNDERSCORE) + ".tif"
                 else:
-                    result_filename = result_name.lower().replace(" ", "_") + ".tif"
+                    result_filename = result_name.lower().translate(SPACE_TO_UNDERSCORE) + ".tif"
             else:
                 # Extract just a filename from the attachment URL
                 result_filename = result_attachment_url.rsplit("/", 1)[-1].split("?", 1)[0]
-            result_checkbox = QCheckBox(result_name)
-            result_checkbox.setEnabled(result_enabled)
-            results_checkbox_item = QStandardItem("")
+            result_item = QStandardItem(result_name)
+            result_item.setEditable(False)
+            result_item.setCheckable(True)
+            result_item.setCheckState(Qt.Unchecked)
+            result_item.setEnabled(result_enabled)
             result_filename_item = QStandardItem(result_filename)
             result_filename_item.setEnabled(result_enabled)
-            checkboxes_width.append(result_checkbox.width())
-            self.scenario_results_model.appendRow([results_checkbox_item, result_filename_item])
-            self.scenario_results_tv.setIndexWidget(self.scenario_results_model.index(row_number, 0), result_checkbox)
-            result["checkbox"] = result_checkbox
+            result_rows.append([result_item, result_filename_item])
+            result["row"] = row_number
             result["filename"] = result_filename
             self.current_scenario_results[result_id] = result
-        for i in range(len(header)):
-            self.scenario_results_tv.resizeColumnToContents(i)
-        if checkboxes_width:
-            self.scenario_results_tv.setColumnWidth(0, max(checkboxes_width))
+        populate_view(self.scenario_results_tv, result_rows)
+        self.listed_results_scenario_uuid = scenario_uuid
         self.pb_download.setEnabled(True)
         self.grp_raster_settings.setEnabled(True)
         self.toggle_selection_ckb.setEnabled(True)
         raster_resolution = scenario_instance["pixelsize_x"]
         self.pixel_size_sbox.setValue(raster_resolution if raster_resolution else RASTER_FALLBACK_RESOLUTION)
-        scenario_crs = QgsCoordinateReferenceSystem.fromOgcWmsCrs(scenario_instance["projection"])
+        scenario_crs = crs_from_ogc_wms(scenario_instance["projection"])
         self.crs_widget.setCrs(scenario_crs)
 
     def load_scenario_as_wms_layers(self):
         """Loading selected scenario as a set of the WMS layers."""
-        wms_provider = "wms"
         index = self.scenario_tv.currentIndex()
         if index.isValid():
             current_row = index.row()
@@ -357,27 +540,47 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
             scenario_name_item = self.scenario_model.item(current_row, self.SCENARIO_NAME_COLUMN_IDX)
             scenario_name = scenario_name_item.text()
             get_capabilities_url = f"{self.plugin.settings.wms_url}scenario_{scenario_uuid}/?request=GetCapabilities"
-            layers_to_add = []
-            try:
-                for layer_name, layer_uri in get_capabilities_layer_uris(get_capabilities_url):
-                    layer = QgsRasterLayer(layer_uri, layer_name, wms_provider)
-                    layers_to_add.append(layer)
-            except WMSServiceException as e:
-                error_message = f"Loading of the requested scenario WMS layers failed due to following error:\n{e}"
-                self.log_feedback(error_message, Qgis.Critical)
-                self.plugin.communication.show_error(error_message)
-                return
-            scenario_group = create_tree_group(scenario_name)
-            extent = QgsRectangle()
-            extent.setMinimal()
-            for wms_layer in layers_to_add:
-                extent.combineExtentWith(wms_layer.extent())
-                wms_layer.setCustomProperty("identify/format", "Text")
-                add_layer_to_group(scenario_group, wms_layer)
-            map_canvas = self.plugin.iface.mapCanvas()
-            map_canvas.setExtent(extent)
-            map_canvas.refresh()
-            self.log_feedback(f"WMS layers for scenario '{scenario_name}' added to the project.")
+            self.fetch_wms_layers(get_capabilities_url, "scenario", scenario_name)
+
+    def fetch_wms_layers(self, get_capabilities_url, item_type, item_name):
+        """Fetch WMS layers of the scenario or raster in the background."""
+        try:
+            api_key = self.plugin.downloader.get_api_key()
+        except Exception as e:
+            self.on_wms_layers_fetch_failed(str(e), item_type)
+            return
+        wms_layers_fetcher = WMSLayersFetcher(get_capabilities_url, api_key)
+        wms_layers_fetcher.signals.fetch_finished.connect(
+            lambda wms_layer_uris: self.add_wms_layers(wms_layer_uris, item_type, item_name)
+        )
+        wms_layers_fetcher.signals.fetch_failed.connect(
+            lambda error: self.on_wms_layers_fetch_failed(error, item_type)
+        )
+        self.lizard_fetcher_pool.start(wms_layers_fetcher)
+
+    def add_wms_layers(self, wms_layer_uris, item_type, item_name):
+        """Add fetched WMS layers of the scenario or raster to the project."""
+        wms_provider = "wms"
+        layers_to_add = []
+        for layer_name, layer_uri in wms_layer_uris:
+            layer = QgsRasterLayer(layer_uri, layer_name, wms_provider)
+            layers_to_add.append(layer)
+        item_group = create_tree_group(item_name)
+        for wms_layer in layers_to_add:
+            wms_layer.setCustomProperty("identify/format", "Text")
+        add_layers_to_group(item_group, layers_to_add)
+        map_canvas = self.plugin.iface.mapCanvas()
+        map_settings = map_canvas.mapSettings()
+        extent = layers_extent(layers_to_add, map_settings.destinationCrs(), map_settings.transformContext())
+        map_canvas.setExtent(extent)
+        map_canvas.refresh()
+        self.log_feedback(f"WMS layers for {item_type} '{item_name}' added to the project.")
+
+    def on_wms_layers_fetch_failed(self, error, item_type):
+        """Feedback on the failed fetch of the WMS layers."""
+        error_message = f"Loading of the requested {item_type} WMS layers failed due to following error:\n{error}"
+        self.log_feedback(error_message, Qgis.Critical)
+        self.plugin.communication.show_error(error_message)
 
     def download_results(self):
         """Download selected (checked) result files."""
@@ -388,22 +591,19 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
         scenario_uuid_item = self.scenario_model.item(current_row, self.SCENARIO_UUID_COLUMN_IDX)
         scenario_uuid = scenario_uuid_item.text()
         scenario_instance = deepcopy(self.current_scenario_instances[scenario_uuid])
-        download_dir = self.discover_download_directory(scenario_instance)
+        download_dir = self.discover_download_directory()
         if not download_dir:
             self.plugin.communication.bar_info("Downloading results files canceled..")
             return
         rasters_to_download, raw_results_to_download = [], []
         for result in self.current_scenario_results.values():
-            checkbox = result["checkbox"]
-            raster = result["raster"]
-            if not checkbox.isChecked():
+            result_item = self.scenario_results_model.item(result["row"], 0)
+            if result_item.checkState() != Qt.Checked:
                 continue
-            # Remove checkbox before sending to separate thread
-            result_copy = {k: v for k, v in result.items() if k != "checkbox"}
-            if raster:
-                rasters_to_download.append(result_copy)
+            if result["raster"]:
+                rasters_to_download.append(result)
             else:
-                raw_results_to_download.append(result_copy)
+                raw_results_to_download.append(result)
         scenario_name = scenario_instance["name"]
         no_data = self.no_data_sbox.value()
         resolution = self.pixel_size_sbox.value()
@@ -415,9 +615,19 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
             return
         # Adjust scenario instance spatial boundaries to the selected CRS (if necessary)
         scenario_instance_epsg = scenario_instance["projection"]
-        scenario_instance_crs = QgsCoordinateReferenceSystem.fromOgcWmsCrs(scenario_instance_epsg)
+        scenario_instance_crs = crs_from_ogc_wms(scenario_instance_epsg)
         if scenario_instance_crs != target_crs:
             unify_spatial_boundaries(scenario_instance, scenario_instance_crs, target_crs)
+        threedi_auth = None
+        if scenario_instance["model_identifier"]:
+            # 3Di credentials are stored in the QGIS auth manager - resolve them here, not in the worker
+            try:
+                threedi_auth = get_threedi_auth()
+            except Exception as e:
+                warn_msg = (
+                    f"Failed to set proper schematisation revision results folder due to the following error: {e}."
+                )
+                self.plugin.communication.log_warn(warn_msg)
         scenario_items_downloader = ScenarioItemsDownloader(
             self.plugin.downloader,
             scenario_instance,
@@ -427,10 +637,13 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
             no_data,
             resolution,
             projection,
+            self.plugin.settings.download_workers,
+            threedi_auth,
         )
         scenario_items_downloader.signals.download_progress.connect(self.on_download_progress)
         scenario_items_downloader.signals.download_finished.connect(self.on_download_finished)
         scenario_items_downloader.signals.download_failed.connect(self.on_download_failed)
+        scenario_items_downloader.signals.download_warning.connect(self.plugin.communication.log_warn)
         self.plugin.lizard_downloader_pool.start(scenario_items_downloader)
         self.log_feedback(f"Scenario '{scenario_name}' results download task added to the queue.")
 
@@ -445,15 +658,15 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
         self.plugin.communication.clear_message_bar()
         self.plugin.communication.bar_info(message)
         self.log_feedback(message)
-        file_types_to_add = {"tif", "vrt"}
-        files_to_add = [fname for fname in downloaded_files.keys() if fname.rsplit(".", 1)[-1] in file_types_to_add]
-        if file_types_to_add:
+        files_to_add = [fname for fname in downloaded_files.keys() if fname.endswith(self.LAYER_FILE_EXTENSIONS)]
+        if files_to_add:
             downloaded_item_name = downloaded_item_instance["name"]
             downloaded_item_grp = create_tree_group(downloaded_item_name)
-            for raster_filename in files_to_add:
-                raster_filepath = downloaded_files[raster_filename]
-                raster_layer = QgsRasterLayer(raster_filepath, raster_filename, "gdal")
-                add_layer_to_group(downloaded_item_grp, raster_layer)
+            raster_layers = [
+                QgsRasterLayer(downloaded_files[raster_filename], raster_filename, "gdal")
+                for raster_filename in files_to_add
+            ]
+            add_layers_to_group(downloaded_item_grp, raster_layers)
             downloaded_item_grp.setExpanded(False)
 
     def on_download_failed(self, scenario_instance, error_message):
@@ -464,9 +677,8 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
 
     def search_for_rasters(self):
         """Method used for searching rasters with text typed withing search bar."""
-        self.page_sbox_raster.valueChanged.disconnect(self.fetch_rasters)
         self.page_sbox_raster.setValue(1)
-        self.page_sbox_raster.valueChanged.connect(self.fetch_rasters)
+        self.raster_page_timer.stop()
         self.fetch_rasters()
 
     def previous_rasters(self):
@@ -497,49 +709,45 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
             self.pb_download_raster.setDisabled(True)
 
     def fetch_rasters(self):
-        """Fetch and list matching rasters."""
+        """Fetch matching rasters in the background."""
+        self.rasters_fetch_id = next(self.fetch_ids)
+        self.fetch_page(
+            self.rasters_fetch_id,
+            "rasters",
+            self.raster_pages_cache,
+            self.raster_search_le.text(),
+            self.page_sbox_raster,
+            self.list_rasters,
+        )
+
+    def list_rasters(self, fetch_id, matching_rasters_count, matching_rasters):
+        """List fetched matching rasters."""
+        if fetch_id != self.rasters_fetch_id:
+            return
         try:
-            searched_text = self.raster_search_le.text()
-            matching_rasters_count = count_rasters_with_name(self.plugin.settings.api_url, searched_text)
             pages_nr = ceil(matching_rasters_count / self.TABLE_LIMIT) or 1
             self.page_sbox_raster.setMaximum(pages_nr)
             self.page_sbox_raster.setSuffix(f" / {pages_nr}")
             self.current_raster_instances.clear()
-            self.raster_model.clear()
-            offset = (self.page_sbox_raster.value() - 1) * self.TABLE_LIMIT
-            header = ["🕒", "Name", "Description", "Organisation", "Last update", "UUID"]
-            self.raster_model.setHorizontalHeaderLabels(header)
-            matching_rasters = find_rasters(
-                self.plugin.settings.api_url, self.TABLE_LIMIT, offset=offset, name__icontains=searched_text
-            )
-            for raster_instance in sorted(matching_rasters, key=itemgetter("created"), reverse=True):
+            raster_rows = []
+            for raster_instance in matching_rasters:
                 raster_uuid = raster_instance["uuid"]
-                uuid_item = QStandardItem(raster_uuid)
-                temporal_item = QStandardItem("🕒" if raster_instance["temporal"] else "")
-                name_item = QStandardItem(raster_instance["name"])
-                description_item = QStandardItem(raster_instance["description"])
-                organisation_item = QStandardItem(raster_instance["organisation"]["name"])
-                last_updated_item = QStandardItem(raster_instance["last_modified"].split("T")[0])
-                raster_items = [
-                    temporal_item,
-                    name_item,
-                    description_item,
-                    organisation_item,
-                    last_updated_item,
-                    uuid_item,
+                raster_texts = [
+                    "🕒" if raster_instance["temporal"] else "",
+                    raster_instance["name"],
+                    raster_instance["description"],
+                    raster_instance["organisation"]["name"],
+                    raster_instance["last_modified"].split("T")[0],
+                    raster_uuid,
                 ]
-                self.raster_model.appendRow(raster_items)
+                raster_rows.append(raster_texts)
                 self.current_raster_instances[raster_uuid] = raster_instance
-            for i in range(len(header)):
-                self.raster_tv.resizeColumnToContents(i)
+            populate_view_texts(self.raster_tv, raster_rows)
         except Exception as e:
-            self.close()
-            error_msg = f"Error: {e}"
-            self.plugin.communication.show_error(error_msg)
+            self.on_fetch_failed(fetch_id, f"Error: {e}")
 
     def load_raster_as_wms_layers(self):
-        """Loading selected scenario as a set of the WMS layers."""
-        wms_provider = "wms"
+        """Loading selected raster as a set of the WMS layers."""
         index = self.raster_tv.currentIndex()
         if index.isValid():
             current_row = index.row()
@@ -548,34 +756,18 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
             raster_name_item = self.raster_model.item(current_row, self.RASTER_NAME_COLUMN_IDX)
             raster_name = raster_name_item.text()
             get_capabilities_url = f"{self.plugin.settings.wms_url}raster_{raster_uuid}/?request=GetCapabilities"
-            layers_to_add = []
-            try:
-                for layer_name, layer_uri in get_capabilities_layer_uris(get_capabilities_url):
-                    layer = QgsRasterLayer(layer_uri, layer_name, wms_provider)
-                    layers_to_add.append(layer)
-            except WMSServiceException as e:
-                error_message = f"Loading of the requested raster WMS layers failed due to following error:\n{e}"
-                self.log_feedback(error_message, Qgis.Critical)
-                self.plugin.communication.show_error(error_message)
-                return
-            raster_group = create_tree_group(raster_name)
-            extent = QgsRectangle()
-            extent.setMinimal()
-            for wms_layer in layers_to_add:
-                extent.combineExtentWith(wms_layer.extent())
-                wms_layer.setCustomProperty("identify/format", "Text")
-                add_layer_to_group(raster_group, wms_layer)
-            map_canvas = self.plugin.iface.mapCanvas()
-            map_canvas.setExtent(extent)
-            map_canvas.refresh()
-            self.log_feedback(f"WMS layers for raster '{raster_name}' added to the project.")
+            self.fetch_wms_layers(get_capabilities_url, "raster", raster_name)
 
     def download_raster_file(self):
         """Download selected raster."""
         index = self.raster_tv.currentIndex()
         if not index.isValid():
             return
-        download_settings_dlg = RasterDownloadSettings(self)
+        if self.raster_download_settings_dlg is None:
+            self.raster_download_settings_dlg = RasterDownloadSettings(self)
+        else:
+            self.raster_download_settings_dlg.populate_selected_raster_settings()
+        download_settings_dlg = self.raster_download_settings_dlg
         res = download_settings_dlg.exec_()
         if res != QDialog.Accepted:
             self.raise_()
@@ -590,7 +782,7 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
         resolution = download_settings_dlg.pixel_size_sbox_raster.value()
         resolution = resolution if resolution else None
         projection = download_settings_dlg.crs_widget_raster.crs().authid()
-        target_crs = QgsCoordinateReferenceSystem.fromOgcWmsCrs(projection)
+        target_crs = crs_from_ogc_wms(projection)
         if not download_dir:
             self.plugin.communication.show_warn("Output directory not specified - please specify it and try again.")
             self.raise_()
@@ -617,7 +809,7 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
             polygon_wkt = self.plugin.iface.mapCanvas().extent().asWktPolygon()
             polygon_geom = QgsGeometry.fromWkt(polygon_wkt)
             polygon_geom = reproject_geometry(polygon_geom, project_crs, target_crs)
-            named_extent_polygons = {(polygon_id, polygon_name): polygon_geom.asWkt()}
+            named_extent_polygons = {(polygon_id, polygon_name): (polygon_geom.asWkt(), geometry_bbox(polygon_geom))}
             crop_to_polygon = False
         # If polygon extent
         else:
@@ -630,11 +822,15 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
                 QTimer.singleShot(1, self.download_raster_file)
                 return
             polygon_name_field = download_settings_dlg.clip_name_field_cbo.currentField()
+            polygon_name_field_idx = polygon_layer.fields().indexFromName(polygon_name_field)
             if download_settings_dlg.selected_features_ckb.isChecked():
                 features_iterator = polygon_layer.selectedFeatures()
                 number_of_features = polygon_layer.selectedFeatureCount()
             else:
-                features_iterator = polygon_layer.getFeatures()
+                # Only the name field attribute is needed besides the geometry
+                features_request = QgsFeatureRequest()
+                features_request.setSubsetOfAttributes([polygon_name_field_idx] if polygon_name_field_idx >= 0 else [])
+                features_iterator = polygon_layer.getFeatures(features_request)
                 number_of_features = polygon_layer.featureCount()
             if number_of_features == 0:
                 self.plugin.communication.show_warn("There are no clip features defined - raster downloading canceled.")
@@ -650,19 +846,20 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
                 QTimer.singleShot(1, self.download_raster_file)
                 return
             polygon_layer_crs = polygon_layer.crs()
+            # Build the transformation once and reuse it for all the features
+            polygon_transformation = get_coordinate_transform(polygon_layer_crs, target_crs)
             named_extent_polygons = {}
             for feat in features_iterator:
                 fid = feat.id()
-                try:
-                    polygon_name = feat[polygon_name_field]
-                except KeyError:
-                    polygon_name = raster_name
-                polygon_wkt = reproject_geometry(feat.geometry(), polygon_layer_crs, target_crs).asWkt()
-                named_extent_polygons[fid, polygon_name] = polygon_wkt
+                polygon_name = feat.attribute(polygon_name_field_idx) if polygon_name_field_idx >= 0 else raster_name
+                polygon_geom = reproject_geometry(
+                    feat.geometry(), polygon_layer_crs, target_crs, polygon_transformation
+                )
+                named_extent_polygons[fid, polygon_name] = (polygon_geom.asWkt(), geometry_bbox(polygon_geom))
             crop_to_polygon = download_settings_dlg.clip_to_polygon_ckb.isChecked()
         # Adjust raster instance spatial boundaries to the selected CRS (if necessary)
         raster_instance_epsg = raster_instance["projection"]
-        raster_instance_crs = QgsCoordinateReferenceSystem.fromOgcWmsCrs(raster_instance_epsg)
+        raster_instance_crs = crs_from_ogc_wms(raster_instance_epsg)
         if raster_instance_crs != target_crs:
             unify_spatial_boundaries(raster_instance, raster_instance_crs, target_crs)
         # Spawn raster downloading task
@@ -676,6 +873,7 @@ class LizardBrowser(lizard_uicls, lizard_basecls):
             no_data,
             resolution,
             projection,
+            self.plugin.settings.download_workers,
         )
         raster_downloader.signals.download_progress.connect(self.on_download_progress)
         raster_downloader.signals.download_finished.connect(self.on_download_finished)
@@ -5,12 +5,20 @@ import webbrowser
 
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import QSettings
-from qgis.PyQt.QtWidgets import QDialog, QInputDialog
+from qgis.PyQt.QtWidgets import QInputDialog
 
-from lizard_qgis_plugin.utils import LIZARD_SETTINGS_ENTRY, get_api_key_auth_manager, set_api_key_auth_manager
+from lizard_qgis_plugin.utils import (
+    LIZARD_SETTINGS_ENTRY,
+    get_api_key_auth_manager,
+    get_lizard_session_requests,
+    set_api_key_auth_manager,
+)
 
+base_dir = os.path.dirname(__file__)
+settings_uicls, settings_basecls = uic.loadUiType(os.path.join(base_dir, "ui", "settings.ui"))
 
-class SettingsDialog(QDialog):
+
+class SettingsDialog(settings_uicls, settings_basecls):
     """Dialog with plugin settings."""
 
     HTTPS_PREFIX = "https://"
@@ -18,21 +26,33 @@ class SettingsDialog(QDialog):
     WMS_URL_SUFFIX = "/wms/"
     MANAGEMENT_URL_SUFFIX = "/management/"
     DEFAULT_BASE_URL = "nens.lizard.net"
+    DEFAULT_DOWNLOAD_WORKERS = 4
+    PAK_LABELS = (
+        """<html><head/><body><p><span style=" color:#ff0000;">
+            ✕ Not found</span></p></body></html>""",
+        """<html><head/><body><p><span style=" color:#00aa00;">
+            ✓ Available</span></p></body></html>""",
+    )  # Personal API Key label texts, indexed by the key availability
 
     def __init__(self, plugin, parent=None):
-        QDialog.__init__(self, parent)
-        plugin_dir = os.path.dirname(os.path.realpath(__file__))
-        ui_filepath = os.path.join(plugin_dir, "ui", "settings.ui")
-        self.ui = uic.loadUi(ui_filepath, self)
+        super().__init__(parent)
+        self.setupUi(self)
         self.iface = plugin.iface
         self.downloader = plugin.downloader
         self.communication = plugin.communication
+        self.qsettings = QSettings()
         self.base_url_settings_entry = f"{LIZARD_SETTINGS_ENTRY}/base_url"
-        self.base_url_le.setText(QSettings().value(self.base_url_settings_entry, self.DEFAULT_BASE_URL))
+        self.base_url_le.setText(self.qsettings.value(self.base_url_settings_entry, self.DEFAULT_BASE_URL))
+        self.download_workers_settings_entry = f"{LIZARD_SETTINGS_ENTRY}/download_workers"
+        self.download_workers_sbox.setValue(
+            self.qsettings.value(self.download_workers_settings_entry, self.DEFAULT_DOWNLOAD_WORKERS, type=int)
+        )
+        self.download_workers_sbox.valueChanged.connect(self.change_download_workers)
         self.change_base_url_pb.clicked.connect(self.change_base_url)
         self.set_pak_pb.clicked.connect(self.set_personal_api_key)
         self.obtain_pak_pb.clicked.connect(self.obtain_personal_api_key)
-        self.ui.close_pb.clicked.connect(self.close)
+        self.close_pb.clicked.connect(self.close)
+        self.update_urls()
         self.patch_downloader()
         self.setup_api_key_label()
 
@@ -41,6 +61,7 @@ class SettingsDialog(QDialog):
         self.downloader.LIZARD_URL = self.api_url
         self.downloader.get_api_key = get_api_key_auth_manager
         self.downloader.set_api_key = set_api_key_auth_manager
+        self.downloader.requests = get_lizard_session_requests()
 
     def setup_api_key_label(self):
         """Loading plugin settings from QSettings."""
@@ -54,29 +75,16 @@ class SettingsDialog(QDialog):
         url = self.base_url_le.text()
         return url
 
-    @property
-    def api_url(self):
-        if self.base_url:
-            url = f"{self.HTTPS_PREFIX}{self.base_url}{self.API_URL_SUFFIX}"
-        else:
-            url = f"{self.HTTPS_PREFIX}{self.DEFAULT_BASE_URL}{self.API_URL_SUFFIX}"
-        return url
+    def update_urls(self):
+        """Build Lizard API, WMS and management URLs out of the current base URL."""
+        root_url = self.HTTPS_PREFIX + (self.base_url or self.DEFAULT_BASE_URL)
+        self.api_url = root_url + self.API_URL_SUFFIX
+        self.wms_url = root_url + self.WMS_URL_SUFFIX
+        self.management_url = root_url + self.MANAGEMENT_URL_SUFFIX
 
     @property
-    def wms_url(self):
-        if self.base_url:
-            url = f"{self.HTTPS_PREFIX}{self.base_url}{self.WMS_URL_SUFFIX}"
-        else:
-            url = f"{self.HTTPS_PREFIX}{self.DEFAULT_BASE_URL}{self.WMS_URL_SUFFIX}"
-        return url
-
-    @property
-    def management_url(self):
-        if self.base_url:
-            url = f"{self.HTTPS_PREFIX}{self.base_url}{self.MANAGEMENT_URL_SUFFIX}"
-        else:
-            url = f"{self.HTTPS_PREFIX}{self.DEFAULT_BASE_URL}{self.MANAGEMENT_URL_SUFFIX}"
-        return url
+    def download_workers(self):
+        return self.download_workers_sbox.value()
 
     @property
     def api_key(self):
@@ -84,6 +92,7 @@ class SettingsDialog(QDialog):
         return pak
 
     def update_lizard_url(self):
+        self.update_urls()
         self.downloader.LIZARD_URL = self.api_url
 
     def update_api_key(self, api_key):
@@ -97,10 +106,16 @@ class SettingsDialog(QDialog):
         base_url = base_url.strip("/")
         if base_url.startswith(self.HTTPS_PREFIX):
             base_url = base_url[len(self.HTTPS_PREFIX) :]
-        QSettings().setValue(self.base_url_settings_entry, base_url)
+        if base_url == self.base_url:
+            return
+        self.qsettings.setValue(self.base_url_settings_entry, base_url)
         self.base_url_le.setText(base_url)
         self.update_lizard_url()
 
+    def change_download_workers(self, download_workers):
+        """Change number of the files downloaded at the same time."""
+        self.qsettings.setValue(self.download_workers_settings_entry, download_workers)
+
     def set_personal_api_key(self):
         """Setting active Personal API Key."""
         pak, accept = QInputDialog.getText(self, "Personal API Key", "Paste your Personal API Key:")
@@ -115,13 +130,7 @@ class SettingsDialog(QDialog):
 
     def set_personal_api_key_label(self, personal_api_key_available):
         """Setting Personal API Key label text."""
-        if personal_api_key_available:
-            label_txt = """<html><head/><body><p><span style=" color:#00aa00;">
-            ✓ Available</span></p></body></html>"""
-        else:
-            label_txt = """<html><head/><body><p><span style=" color:#ff0000;">
-            ✕ Not found</span></p></body></html>"""
-        self.pak_label.setText(label_txt)
+        self.pak_label.setText(self.PAK_LABELS[bool(personal_api_key_available)])
 
     def ensure_api_key_present(self):
         """Check if API key is present."""
@@ -1,21 +1,32 @@
 # Lizard plugin for QGIS, licensed under GPLv2 or (at your option) any later version
 # Copyright (C) 2023 by Lutra Consulting for 3Di Water Management
 import os
+import random
+import shutil
 import tempfile
 import time
-import uuid
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from functools import partial
 
-import requests
-from qgis.core import QgsGeometry
 from qgis.PyQt.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
 from threedi_mi_utils import bypass_max_path_limit
 
 from lizard_qgis_plugin.utils import (
     build_vrt,
-    clip_raster,
-    create_raster_tasks,
+    clip_rasters,
+    create_rasters_tasks,
+    download_file_atomically,
+    find_with_count,
+    get_capabilities_layer_uris,
+    get_content_length,
+    get_scenario_results,
+    get_scenario_results_rasters,
+    get_schematisation_revision_results_dir,
+    get_task_instances,
+    get_url_raster_instances,
     layer_to_gpkg,
+    run_limited_download,
     split_raster_extent,
     split_scenario_extent,
     translate_illegal_chars,
@@ -29,18 +40,226 @@ class LizardDownloadError(Exception):
     pass
 
 
+def download_tasks_files(
+    downloader,
+    download_items,
+    max_workers,
+    on_downloaded,
+    min_check_interval=1,
+    max_check_interval=10,
+):
+    """
+    Download the raster tasks files as soon as each of the tasks is finished.
+    The `download_items` are (filename, task_id, target_filepath, increase_current_step) tuples.
+    Status of the running tasks is polled with a (jittered) exponential backoff per task,
+    the tasks due for the check at the same time are looked up together.
+    Each finished download is reported with the `on_downloaded(filename, increase_current_step)` callback.
+    """
+    success_statuses = {"SUCCESS"}
+    in_progress_statuses = {"PENDING", "UNKNOWN", "STARTED", "RETRY"}
+    lizard_url = downloader.LIZARD_URL
+    api_key = downloader.get_api_key()
+    pending_items = {download_item[1]: download_item for download_item in download_items}
+    check_intervals = dict.fromkeys(pending_items, min_check_interval)
+    next_check_times = dict.fromkeys(pending_items, time.monotonic())
+    download_futures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while pending_items or download_futures:
+                check_time = time.monotonic()
+                due_task_ids = [task_id for task_id in pending_items if next_check_times[task_id] <= check_time]
+                task_instances = get_task_instances(lizard_url, due_task_ids, api_key) if due_task_ids else {}
+                for task_id, task_instance in task_instances.items():
+                    task_status = task_instance["status"]
+                    if task_status in success_statuses:
+                        filename, task_id, target_filepath, increase_current_step = pending_items.pop(task_id)
+                        del check_intervals[task_id], next_check_times[task_id]
+                        # Finished task instance already holds the download URL of the task result
+                        future = executor.submit(
+                            run_limited_download, downloader.download_file, task_instance["result"], target_filepath
+                        )
+                        download_futures[future] = filename, increase_current_step
+                    elif task_status in in_progress_statuses:
+                        check_interval = check_intervals[task_id]
+                        next_check_times[task_id] = check_time + check_interval * random.uniform(0.8, 1.2)
+                        check_intervals[task_id] = min(check_interval * 2, max_check_interval)
+                    else:
+                        error_msg = f"Task {task_id} failed, status was: {task_status}"
+                        raise LizardDownloadError(error_msg)
+                if pending_items:
+                    next_check_time = min(next_check_times[task_id] for task_id in pending_items)
+                    timeout = max(next_check_time - time.monotonic(), 0)
+                else:
+                    timeout = None
+                if not download_futures:
+                    time.sleep(timeout)
+                    continue
+                # Wait for the next task check, but handle the downloads finished in the meantime right away
+                done_futures, _ = wait(download_futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done_futures:
+                    filename, increase_current_step = download_futures.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        error_msg = f"Download of the {filename} failed due to the following error: {e}"
+                        raise LizardDownloadError(error_msg)
+                    on_downloaded(filename, increase_current_step)
+        except Exception:
+            for future in download_futures:
+                future.cancel()
+            raise
+
+
 class LizardDownloaderSignals(QObject):
     """Definition of the items download worker signals."""
 
     download_progress = pyqtSignal(dict, str, int, int)
     download_finished = pyqtSignal(dict, dict, str)
     download_failed = pyqtSignal(dict, str)
+    download_warning = pyqtSignal(str)
 
 
-class ScenarioItemsDownloader(QRunnable):
-    """Worker object responsible for downloading scenario files."""
+class LizardListFetcherSignals(QObject):
+    """Definition of the list fetch worker signals."""
+
+    fetch_finished = pyqtSignal(int, int, list)
+    fetch_failed = pyqtSignal(int, str)
+
+
+class LizardListFetcher(QRunnable):
+    """Worker object responsible for fetching a page of the Lizard endpoint items matching given criteria."""
+
+    def __init__(self, fetch_id, lizard_url, endpoint, limit, api_key, **filters):
+        super().__init__()
+        self.fetch_id = fetch_id
+        self.lizard_url = lizard_url
+        self.endpoint = endpoint
+        self.limit = limit
+        self.api_key = api_key
+        self.filters = filters
+        self.signals = LizardListFetcherSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """Fetching matching items together with the total count of matching items."""
+        try:
+            results_count, matching_items = find_with_count(
+                self.lizard_url, self.endpoint, self.limit, self.api_key, **self.filters
+            )
+            self.signals.fetch_finished.emit(self.fetch_id, results_count, matching_items)
+        except Exception as e:
+            error_msg = f"Error: {e}"
+            self.signals.fetch_failed.emit(self.fetch_id, error_msg)
+
+
+class ScenarioResultsFetcherSignals(QObject):
+    """Definition of the scenario results fetch worker signals."""
+
+    fetch_finished = pyqtSignal(int, str, list, dict)
+    fetch_failed = pyqtSignal(int, str)
+
+
+class ScenarioResultsFetcher(QRunnable):
+    """Worker object responsible for fetching scenario results together with the result rasters instances."""
+
+    def __init__(self, fetch_id, lizard_url, scenario_uuid, api_key):
+        super().__init__()
+        self.fetch_id = fetch_id
+        self.lizard_url = lizard_url
+        self.scenario_uuid = scenario_uuid
+        self.api_key = api_key
+        self.signals = ScenarioResultsFetcherSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """Fetching scenario results and result rasters."""
+        try:
+            scenario_results = get_scenario_results(self.lizard_url, self.scenario_uuid, self.api_key)
+            raster_instances = get_scenario_results_rasters(self.lizard_url, scenario_results, self.api_key)
+            self.signals.fetch_finished.emit(self.fetch_id, self.scenario_uuid, scenario_results, raster_instances)
+        except Exception as e:
+            error_msg = f"Error: {e}"
+            self.signals.fetch_failed.emit(self.fetch_id, error_msg)
+
+
+class WMSLayersFetcherSignals(QObject):
+    """Definition of the WMS layers fetch worker signals."""
+
+    fetch_finished = pyqtSignal(list)
+    fetch_failed = pyqtSignal(str)
+
+
+class WMSLayersFetcher(QRunnable):
+    """Worker object responsible for fetching WMS layers URIs from the WMS capabilities."""
+
+    def __init__(self, get_capabilities_url, api_key):
+        super().__init__()
+        self.get_capabilities_url = get_capabilities_url
+        self.api_key = api_key
+        self.signals = WMSLayersFetcherSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """Fetching WMS layers names and URIs."""
+        try:
+            wms_layer_uris = get_capabilities_layer_uris(self.get_capabilities_url, self.api_key)
+            self.signals.fetch_finished.emit(wms_layer_uris)
+        except Exception as e:
+            self.signals.fetch_failed.emit(str(e))
+
+
+class LizardDownloader(QRunnable):
+    """Base of the workers downloading the Lizard items (scenarios and rasters) with progress reporting."""
+
+    TASK_CHECK_MIN_INTERVAL = 1
+    TASK_CHECK_MAX_INTERVAL = 10
+    PROGRESS_REPORT_INTERVAL = 0.05  # Limit progress updates to ~20 per second
+    DOWNLOAD_MAX_WORKERS = 4
+
+    def __init__(self, downloader, download_item, number_of_steps, download_workers=None):
+        super().__init__()
+        self.downloader = downloader
+        self.download_item = download_item
+        self.download_workers = download_workers or self.DOWNLOAD_MAX_WORKERS
+        self.total_progress = 100
+        self.current_step = 0
+        self.number_of_steps = number_of_steps
+        self.percentage_per_step = self.total_progress / self.number_of_steps
+        self.signals = LizardDownloaderSignals()
+        self.downloaded_files = {}
+        self.last_progress_report_time = None
+        self.last_progress_report = None
 
-    TASK_CHECK_SLEEP_TIME = 5
+    def report_progress(self, progress_message=None, increase_current_step=True):
+        """Report worker progress."""
+        current_progress = int(self.current_step * self.percentage_per_step)
+        if increase_current_step:
+            self.current_step += 1
+        progress_report = (progress_message, current_progress)
+        if progress_report == self.last_progress_report:
+            return  # Nothing new to show
+        report_time = time.monotonic()
+        if (
+            self.last_progress_report_time is not None
+            and report_time - self.last_progress_report_time < self.PROGRESS_REPORT_INTERVAL
+            and current_progress < self.total_progress
+        ):
+            return
+        self.last_progress_report_time = report_time
+        self.last_progress_report = progress_report
+        self.signals.download_progress.emit(self.download_item, progress_message, current_progress, self.total_progress)
+
+    def report_failure(self, error_message):
+        """Report worker failure message."""
+        self.signals.download_failed.emit(self.download_item, error_message)
+
+    def report_finished(self, message):
+        """Report worker finished message."""
+        self.signals.download_finished.emit(self.download_item, self.downloaded_files, message)
+
+
+class ScenarioItemsDownloader(LizardDownloader):
+    """Worker object responsible for downloading scenario files."""
 
     def __init__(
         self,
@@ -52,123 +271,165 @@ class ScenarioItemsDownloader(QRunnable):
         no_data,
         resolution,
         projection,
+        download_workers=None,
+        threedi_auth=None,
     ):
-        super().__init__()
-        self.downloader = downloader
+        number_of_steps = 0
+        if raw_results_to_download:
+            number_of_steps += len(raw_results_to_download)
+        if raster_results:
+            number_of_steps += len(raster_results) + 1  # Extra step for spawning raster creation tasks
+        super().__init__(downloader, scenario_instance, number_of_steps, download_workers)
+        self.threedi_auth = threedi_auth
         self.scenario_instance = scenario_instance
         self.scenario_id = scenario_instance["uuid"]
         self.scenario_name = scenario_instance["name"]
         self.scenario_simulation_id = int(scenario_instance["simulation_identifier"])
         self.raw_results_to_download = raw_results_to_download
         self.raster_results = raster_results
-        self.scenario_download_dir = os.path.join(
-            download_dir, translate_illegal_chars(f"{self.scenario_name} ({self.scenario_simulation_id})")
-        )
+        self.download_dir = download_dir
+        self.scenario_download_dir = None
         self.no_data = no_data
         self.resolution = resolution
         self.projection = projection
-        self.total_progress = 100
-        self.current_step = 0
-        self.number_of_steps = 0
-        if raw_results_to_download:
-            self.number_of_steps += len(raw_results_to_download)
-        if raster_results:
-            self.number_of_steps += len(self.raster_results) + 1  # Extra step for spawning raster creation tasks
-        self.percentage_per_step = self.total_progress / self.number_of_steps
-        self.signals = LizardDownloaderSignals()
-        self.downloaded_files = {}
+
+    def download_concurrently(self, download_items, download_method):
+        """
+        Download files concurrently with the `download_method(source, target_filepath)`.
+        The `download_items` are (filename, source, target_filepath, increase_current_step) tuples.
+        Progress is reported as the downloads complete, downloaded files are registered in the original order.
+        """
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            futures = {
+                executor.submit(run_limited_download, download_method, source, target_filepath): (filename, step)
+                for filename, source, target_filepath, step in download_items
+            }
+            for future in as_completed(futures):
+                filename, increase_current_step = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    for pending_future in futures:
+                        pending_future.cancel()
+                    error_msg = f"Download of the {filename} failed due to the following error: {e}"
+                    raise LizardDownloadError(error_msg)
+                self.report_downloaded(filename, increase_current_step)
+        for filename, source, target_filepath, increase_current_step in download_items:
+            self.downloaded_files[filename] = target_filepath
+
+    def report_downloaded(self, filename, increase_current_step):
+        """Report downloaded scenario file."""
+        progress_msg = f"Downloaded '{filename}' (scenario: '{self.scenario_name}')..."
+        self.report_progress(progress_msg, increase_current_step=increase_current_step)
+
+    def is_already_downloaded(self, result, target_filepath):
+        """Check if the result file left by a previous download has the expected size."""
+        if not os.path.isfile(target_filepath):
+            return False
+        expected_size = result.get("size")
+        if expected_size is None:
+            try:
+                expected_size = get_content_length(result["attachment_url"], self.downloader.get_api_key())
+            except Exception:
+                return False
+        return expected_size is not None and os.path.getsize(target_filepath) == expected_size
 
     def download_raw_results(self):
+        download_items = []
         for result in self.raw_results_to_download:
             attachment_url = result["attachment_url"]
             attachment_filename = result["filename"]
             target_filepath = bypass_max_path_limit(os.path.join(self.scenario_download_dir, attachment_filename))
-            progress_msg = f"Downloading '{attachment_filename}' (scenario: '{self.scenario_name}')..."
-            self.report_progress(progress_msg)
-            try:
-                self.downloader.download_file(attachment_url, target_filepath)
-            except Exception as e:
-                error_msg = f"Download of the {attachment_filename} failed due to the following error: {e}"
-                raise LizardDownloadError(error_msg)
-            self.downloaded_files[attachment_filename] = target_filepath
+            if self.is_already_downloaded(result, target_filepath):
+                self.downloaded_files[attachment_filename] = target_filepath
+                progress_msg = f"Already downloaded '{attachment_filename}' (scenario: '{self.scenario_name}')..."
+                self.report_progress(progress_msg)
+                continue
+            download_items.append((attachment_filename, attachment_url, target_filepath, True))
+        if download_items:
+            progress_msg = f"Downloading {len(download_items)} file(s) (scenario: '{self.scenario_name}')..."
+            self.report_progress(progress_msg, increase_current_step=False)
+            self.download_concurrently(download_items, partial(download_file_atomically, self.downloader.download_file))
 
     def download_raster_results(self):
-        task_raster_results, processed_tasks = {}, {}
-        success_statuses = {"SUCCESS"}
-        in_progress_statuses = {"PENDING", "UNKNOWN", "STARTED", "RETRY"}
+        task_raster_results = {}
         # Create tasks
         progress_msg = f"Spawning raster tasks and preparing for download (scenario: '{self.scenario_name}')..."
         self.report_progress(progress_msg)
         spatial_bounds = split_scenario_extent(self.scenario_instance, self.resolution)
-        for raster_result in self.raster_results:
-            raster_url = raster_result["raster"]
-            lizard_url = self.downloader.LIZARD_URL
-            api_key = self.downloader.get_api_key()
-            raster_response = requests.get(url=raster_url, auth=("__key__", api_key))
-            raster_response.raise_for_status()
-            raster = raster_response.json()
+        lizard_url = self.downloader.LIZARD_URL
+        api_key = self.downloader.get_api_key()
+        # Metadata of the result rasters are independent - fetch them all at once
+        rasters = get_url_raster_instances(api_key, [raster_result["raster"] for raster_result in self.raster_results])
+        rasters_tasks = create_rasters_tasks(
+            lizard_url, api_key, [(raster, spatial_bounds) for raster in rasters], self.projection, self.no_data
+        )
+        for raster_result, tasks in zip(self.raster_results, rasters_tasks):
             original_raster_filename = raster_result["filename"]
             raster_name, raster_extension = original_raster_filename.rsplit(".", 1)
-            tasks = create_raster_tasks(lizard_url, api_key, raster, spatial_bounds, self.projection, self.no_data)
             is_chunked_raster = len(tasks) > 1
             for raster_task_idx, task in enumerate(tasks, 1):
                 task_id = task["task_id"]
                 if is_chunked_raster:
                     raster_filename = f"{raster_name}_{raster_task_idx:02d}.{raster_extension}"
-                    raster_result_copy = {k: v for k, v in raster_result.items()}
-                    raster_result_copy["filename"] = raster_filename
-                    task_raster_results[task_id] = raster_result_copy
+                    task_raster_results[task_id] = {**raster_result, "filename": raster_filename}
                 else:
                     task_raster_results[task_id] = raster_result
-                processed_tasks[task_id] = False
-        # Check status of task and download
-        while not all(processed_tasks.values()):
-            for task_id, processed in processed_tasks.items():
-                if processed:
-                    continue
-                task_status = self.downloader.get_task_status(task_id)
-                if task_status in success_statuses:
-                    processed_tasks[task_id] = True
-                elif task_status in in_progress_statuses:
-                    continue
-                else:
-                    error_msg = f"Task {task_id} failed, status was: {task_status}"
-                    raise LizardDownloadError(error_msg)
-            time.sleep(self.TASK_CHECK_SLEEP_TIME)
-        # Download tasks files
-        rasters_per_code = defaultdict(list)
+        # Download tasks files as soon as the tasks are finished
+        # Items are sorted by the file name once, so the chunks of each raster code are collected already in order
+        rasters_per_code, raster_codes, download_items = defaultdict(list), {}, []
         for task_id, raster_result in sorted(task_raster_results.items(), key=lambda x: x[1]["filename"]):
             raster_filename = raster_result["filename"]
             raster_code = raster_result["code"]
-            progress_msg = f"Downloading '{raster_filename}' (scenario: '{self.scenario_name}')..."
-            self.report_progress(progress_msg, increase_current_step=raster_code not in rasters_per_code)
             raster_filepath = bypass_max_path_limit(os.path.join(self.scenario_download_dir, raster_filename))
-            self.downloader.download_task(task_id, raster_filepath)
+            download_items.append((raster_filename, task_id, raster_filepath, raster_code not in rasters_per_code))
             rasters_per_code[raster_code].append(raster_filepath)
-            self.downloaded_files[raster_filename] = raster_filepath
-        self.report_progress(progress_msg, increase_current_step=False)
+            raster_codes[raster_filename] = raster_code
+        remaining_per_code = {raster_code: len(filepaths) for raster_code, filepaths in rasters_per_code.items()}
         vrt_options = {"resolution": "average", "resampleAlg": "nearest", "srcNodata": self.no_data}
-        for raster_code, raster_filepaths in rasters_per_code.items():
-            if len(raster_filepaths) > 1:
-                raster_filepaths.sort()
+        vrt_files = {}
+
+        def on_raster_downloaded(raster_filename, increase_current_step):
+            self.report_downloaded(raster_filename, increase_current_step)
+            raster_code = raster_codes[raster_filename]
+            remaining_per_code[raster_code] -= 1
+            raster_filepaths = rasters_per_code[raster_code]
+            if remaining_per_code[raster_code] == 0 and len(raster_filepaths) > 1:
+                # All chunks of the raster are in place - build VRT while the other rasters are still downloading
                 first_raster_filepath = raster_filepaths[0]
                 vrt_filepath = first_raster_filepath.replace("_01", "").replace(".tif", ".vrt")
-                vrt_filename = os.path.basename(vrt_filepath)
                 progress_msg = f"Building VRT: '{vrt_filepath}'..."
                 self.report_progress(progress_msg, increase_current_step=False)
                 build_vrt(vrt_filepath, raster_filepaths, **vrt_options)
-                self.downloaded_files[vrt_filename] = vrt_filepath
-                for raster_filepath in raster_filepaths:
-                    raster_filename = os.path.basename(raster_filepath)
-                    del self.downloaded_files[raster_filename]
+                vrt_files[raster_code] = vrt_filepath
+
+        progress_msg = f"Downloading {len(download_items)} raster file(s) (scenario: '{self.scenario_name}')..."
+        self.report_progress(progress_msg, increase_current_step=False)
+        download_tasks_files(
+            self.downloader,
+            download_items,
+            self.download_workers,
+            on_raster_downloaded,
+            self.TASK_CHECK_MIN_INTERVAL,
+            self.TASK_CHECK_MAX_INTERVAL,
+        )
+        # Chunked rasters are represented by their VRT files
+        for raster_filename, task_id, raster_filepath, increase_current_step in download_items:
+            if raster_codes[raster_filename] not in vrt_files:
+                self.downloaded_files[raster_filename] = raster_filepath
+        for raster_code in rasters_per_code:
+            if raster_code in vrt_files:
+                vrt_filepath = vrt_files[raster_code]
+                self.downloaded_files[os.path.basename(vrt_filepath)] = vrt_filepath
+        self.report_progress(progress_msg, increase_current_step=False)
 
     @pyqtSlot()
     def run(self):
         """Downloading simulation results files."""
         try:
             self.report_progress(increase_current_step=False)
-            if not os.path.exists(self.scenario_download_dir):
-                os.makedirs(self.scenario_download_dir)
+            self.setup_scenario_download_dir()
+            os.makedirs(self.scenario_download_dir, exist_ok=True)
             self.download_raw_results()
             self.download_raster_results()
             self.report_finished(
@@ -180,29 +441,30 @@ class ScenarioItemsDownloader(QRunnable):
             error_msg = f"Download failed due to the following error: {e}"
             self.report_failure(error_msg)
 
-    def report_progress(self, progress_message=None, increase_current_step=True):
-        """Report worker progress."""
-        current_progress = int(self.current_step * self.percentage_per_step)
-        if increase_current_step:
-            self.current_step += 1
-        self.signals.download_progress.emit(
-            self.scenario_instance, progress_message, current_progress, self.total_progress
+    def setup_scenario_download_dir(self):
+        """Set the scenario download directory (within the model schematisation revision results, if available)."""
+        download_dir = self.download_dir
+        model_id = self.scenario_instance["model_identifier"]
+        if model_id and self.threedi_auth is not None:
+            try:
+                revision_results_dir = get_schematisation_revision_results_dir(
+                    download_dir, model_id, self.threedi_auth
+                )
+                if revision_results_dir:
+                    download_dir = revision_results_dir
+            except Exception as e:
+                warn_msg = (
+                    f"Failed to set proper schematisation revision results folder due to the following error: {e}."
+                )
+                self.signals.download_warning.emit(warn_msg)
+        self.scenario_download_dir = os.path.join(
+            download_dir, translate_illegal_chars(f"{self.scenario_name} ({self.scenario_simulation_id})")
         )
 
-    def report_failure(self, error_message):
-        """Report worker failure message."""
-        self.signals.download_failed.emit(self.scenario_instance, error_message)
-
-    def report_finished(self, message):
-        """Report worker finished message."""
-        self.signals.download_finished.emit(self.scenario_instance, self.downloaded_files, message)
 
-
-class RasterDownloader(QRunnable):
+class RasterDownloader(LizardDownloader):
     """Worker object responsible for downloading rasters."""
 
-    TASK_CHECK_SLEEP_TIME = 5
-
     def __init__(
         self,
         downloader,
@@ -214,9 +476,10 @@ class RasterDownloader(QRunnable):
         no_data,
         resolution,
         projection,
+        download_workers=None,
     ):
-        super().__init__()
-        self.downloader = downloader
+        number_of_steps = len(named_extent_polygons) + 1  # Extra step for spawning raster creation tasks
+        super().__init__(downloader, raster_instance, number_of_steps, download_workers)
         self.raster_instance = raster_instance
         self.raster_id = raster_instance["uuid"]
         self.raster_name = raster_name
@@ -226,33 +489,30 @@ class RasterDownloader(QRunnable):
         self.no_data = no_data
         self.resolution = resolution
         self.projection = projection
-        self.total_progress = 100
-        self.current_step = 0
-        self.number_of_steps = len(self.named_extent_polygons) + 1  # Extra step for spawning raster creation tasks
-        self.percentage_per_step = self.total_progress / self.number_of_steps
-        self.signals = LizardDownloaderSignals()
-        self.downloaded_files = {}
+        self.temp_dir = None
 
     def download_raster_files(self):
-        raster_tasks, processed_tasks = {}, {}
-        success_statuses = {"SUCCESS"}
-        in_progress_statuses = {"PENDING", "UNKNOWN", "STARTED", "RETRY"}
+        raster_tasks = {}
         # Create tasks
         progress_msg = f"Spawning raster tasks and preparing for download (raster: '{self.raster_name}')..."
         self.report_progress(progress_msg)
         lizard_url = self.downloader.LIZARD_URL
         api_key = self.downloader.get_api_key()
         # Raster tasks for each extent
-        for polygon_key, polygon_wkt in self.named_extent_polygons.items():
+        polygons_spatial_bounds, wkt_spatial_bounds = [], {}
+        for polygon_wkt, bbox_as_list in self.named_extent_polygons.values():
+            spatial_bounds = wkt_spatial_bounds.get(polygon_wkt)
+            if spatial_bounds is None:
+                # Polygons with the same geometry share the raster extent split
+                spatial_bounds = split_raster_extent(self.raster_instance, bbox_as_list, self.resolution)
+                wkt_spatial_bounds[polygon_wkt] = spatial_bounds
+            polygons_spatial_bounds.append((self.raster_instance, spatial_bounds))
+        polygons_tasks = create_rasters_tasks(
+            lizard_url, api_key, polygons_spatial_bounds, self.projection, self.no_data
+        )
+        for polygon_key, tasks in zip(self.named_extent_polygons, polygons_tasks):
             polygon_fid, polygon_name = polygon_key
             raster_name = f"{self.raster_name} {polygon_fid} {polygon_name}" if polygon_name else self.raster_name
-            polygon_geometry = QgsGeometry.fromWkt(polygon_wkt)
-            bbox = polygon_geometry.boundingBox()
-            bbox_as_list = [bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()]
-            spatial_bounds = split_raster_extent(self.raster_instance, bbox_as_list, self.resolution)
-            tasks = create_raster_tasks(
-                lizard_url, api_key, self.raster_instance, spatial_bounds, self.projection, self.no_data
-            )
             is_chunked_raster = len(tasks) > 1
             raster_tasks[polygon_key] = {}
             for raster_task_idx, task in enumerate(tasks, 1):
@@ -262,42 +522,43 @@ class RasterDownloader(QRunnable):
                 else:
                     raster_filename = f"{raster_name}.tif"
                 raster_tasks[polygon_key][task_id] = raster_filename
-                processed_tasks[task_id] = False
-        # Check status of task and download
-        while not all(processed_tasks.values()):
-            for task_id, processed in processed_tasks.items():
-                if processed:
-                    continue
-                task_status = self.downloader.get_task_status(task_id)
-                if task_status in success_statuses:
-                    processed_tasks[task_id] = True
-                elif task_status in in_progress_statuses:
-                    continue
-                else:
-                    error_msg = f"Task {task_id} failed, status was: {task_status}"
-                    raise LizardDownloadError(error_msg)
-            time.sleep(self.TASK_CHECK_SLEEP_TIME)
-        # Download tasks files
+        # Download tasks files as soon as the tasks are finished
+        polygons_raster_filepaths, download_items = {}, []
         for polygon_key, polygon_tasks in raster_tasks.items():
-            polygon_raster_filepaths = []
+            polygon_raster_filepaths = polygons_raster_filepaths[polygon_key] = []
             for task_id, raster_filename in polygon_tasks.items():
-                progress_msg = f"Downloading '{raster_filename}' (raster: '{self.raster_name}')..."
-                self.report_progress(progress_msg, increase_current_step=False)
                 raster_filepath = bypass_max_path_limit(os.path.join(self.raster_download_dir, raster_filename))
-                raster_url = self.downloader.get_task_download_url(task_id)
-                self.downloader.download_file(raster_url, raster_filepath)
-                self.downloaded_files[raster_filename] = raster_filepath
+                is_first_polygon_raster = not polygon_raster_filepaths
+                download_items.append((raster_filename, task_id, raster_filepath, is_first_polygon_raster))
                 polygon_raster_filepaths.append(raster_filepath)
-            self.report_progress(progress_msg, increase_current_step=True)
+        progress_msg = f"Downloading {len(download_items)} raster file(s) (raster: '{self.raster_name}')..."
+        self.report_progress(progress_msg, increase_current_step=False)
+        download_tasks_files(
+            self.downloader,
+            download_items,
+            self.download_workers,
+            self.report_downloaded,
+            self.TASK_CHECK_MIN_INTERVAL,
+            self.TASK_CHECK_MAX_INTERVAL,
+        )
+        for raster_filename, task_id, raster_filepath, increase_current_step in download_items:
+            self.downloaded_files[raster_filename] = raster_filepath
+        clip_gpkgs = {}
+        for polygon_key, polygon_tasks in raster_tasks.items():
+            polygon_raster_filepaths = polygons_raster_filepaths[polygon_key]
             # Clip raster with clip polygon if option checked.
             if self.crop_to_polygons:
-                temp_dir = tempfile.gettempdir()
-                crop_polygon_wkt = self.named_extent_polygons[polygon_key]
-                clip_polygon_layer = wkt_polygon_layer(crop_polygon_wkt, epsg=self.projection)
-                temp_clip_gpkg = os.path.join(temp_dir, f"clip_polygon_{uuid.uuid4()}.gpkg")
-                layer_to_gpkg(clip_polygon_layer, temp_clip_gpkg, overwrite=True)
-                for raster_filepath in polygon_raster_filepaths:
-                    clip_raster(raster_filepath, temp_clip_gpkg, no_data=self.no_data)
+                if self.temp_dir is None:
+                    self.temp_dir = tempfile.mkdtemp(prefix="lizard_clip_")
+                crop_polygon_wkt, _bbox = self.named_extent_polygons[polygon_key]
+                # Polygons with the same geometry share the clip GeoPackage
+                temp_clip_gpkg = clip_gpkgs.get(crop_polygon_wkt)
+                if temp_clip_gpkg is None:
+                    clip_polygon_layer = wkt_polygon_layer(crop_polygon_wkt, epsg=self.projection)
+                    temp_clip_gpkg = os.path.join(self.temp_dir, f"clip_polygon_{len(clip_gpkgs)}.gpkg")
+                    layer_to_gpkg(clip_polygon_layer, temp_clip_gpkg, overwrite=True)
+                    clip_gpkgs[crop_polygon_wkt] = temp_clip_gpkg
+                clip_rasters(polygon_raster_filepaths, temp_clip_gpkg, no_data=self.no_data)
             # Build VRT if needed
             vrt_options = {"resolution": "average", "resampleAlg": "nearest", "srcNodata": self.no_data}
             if len(polygon_tasks) > 1:
@@ -312,13 +573,17 @@ class RasterDownloader(QRunnable):
                     raster_filename = os.path.basename(raster_filepath)
                     del self.downloaded_files[raster_filename]
 
+    def report_downloaded(self, raster_filename, increase_current_step):
+        """Report downloaded raster file."""
+        progress_msg = f"Downloaded '{raster_filename}' (raster: '{self.raster_name}')..."
+        self.report_progress(progress_msg, increase_current_step=increase_current_step)
+
     @pyqtSlot()
     def run(self):
         """Downloading simulation results files."""
         try:
             self.report_progress(increase_current_step=False)
-            if not os.path.exists(self.raster_download_dir):
-                os.makedirs(self.raster_download_dir)
+            os.makedirs(self.raster_download_dir, exist_ok=True)
             self.download_raster_files()
             self.report_finished("Raster download finished. " f"Downloaded files are in: {self.raster_download_dir}")
         except LizardDownloadError as e:
@@ -326,20 +591,6 @@ class RasterDownloader(QRunnable):
         except Exception as e:
             error_msg = f"Download failed due to the following error: {e}"
             self.report_failure(error_msg)
-
-    def report_progress(self, progress_message=None, increase_current_step=True):
-        """Report worker progress."""
-        current_progress = int(self.current_step * self.percentage_per_step)
-        if increase_current_step:
-            self.current_step += 1
-        self.signals.download_progress.emit(
-            self.raster_instance, progress_message, current_progress, self.total_progress
-        )
-
-    def report_failure(self, error_message):
-        """Report worker failure message."""
-        self.signals.download_failed.emit(self.raster_instance, error_message)
-
-    def report_finished(self, message):
-        """Report worker finished message."""
-        self.signals.download_finished.emit(self.raster_instance, self.downloaded_files, message)
+        finally:
+            if self.temp_dir is not None:
+                shutil.rmtree(self.temp_dir, ignore_errors=True)